@@ -0,0 +1,183 @@
+"""
+Precomputed shortest routes between every pair of locations
+
+For small and medium campuses, every route can be computed ahead of time: a distance matrix
+holds the length of the shortest route between any two locations and a next-hop matrix the
+first step of it, so a route is read off in O(route length) without searching the graph. The
+matrices are computed once per campus data version and saved next to the campus data, so
+later processes load them instead of computing them again.
+
+Memory grows with the square of the number of locations (8 bytes per pair), which is why
+navigation only uses the table up to ALL_PAIRS_MAX_LOCATIONS locations.
+"""
+
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from campus_data import DATA_FILE
+
+ALL_PAIRS_DIR = os.path.join(os.path.dirname(DATA_FILE), 'route_tables')
+FORMAT_VERSION = 1
+
+# Pivot block size and row tile size of the blocked Floyd-Warshall, chosen so that the tile
+# being updated stays in the CPU cache while all pivots of a block are applied to it
+_PIVOT_BLOCK = 32
+_ROW_TILE = 128
+
+
+class AllPairsTable:
+    """
+    Distance and next-hop matrices over the node ids of a CampusGraph
+
+    distances[s, t] is the length of the shortest route from s to t (inf if there is none) and
+    next_hop[s, t] the node that follows s on it (-1 if there is none, t itself for s == t).
+    """
+
+    def __init__(self, distances: np.ndarray, next_hop: np.ndarray):
+        self.distances = distances
+        self.next_hop = next_hop
+        for array in (self.distances, self.next_hop):
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    @classmethod
+    def compute(cls, graph) -> 'AllPairsTable':
+        """
+        Compute the table of a graph
+        Args:
+            graph: navigation.CampusGraph
+        """
+        distances = _floyd_warshall(graph.indptr, graph.indices, graph.weights)
+        return cls(distances, _next_hops(graph.indptr, graph.indices, graph.weights, distances))
+
+    @classmethod
+    def load(cls, path: str, count: int) -> Optional['AllPairsTable']:
+        """
+        Load a table saved with save()
+        Args:
+            path: Table file
+            count: Number of nodes the table must have
+        Returns:
+            The table, or None if the file is missing, unreadable or of another graph
+        """
+        try:
+            with np.load(path) as data:
+                if int(data['format']) != FORMAT_VERSION or data['distances'].shape != (count, count):
+                    return None
+                return cls(data['distances'], data['next_hop'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: str):
+        """Write the table to a file, replaced atomically"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, format=FORMAT_VERSION, distances=self.distances, next_hop=self.next_hop)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def file_path(key: str, directory: str = ALL_PAIRS_DIR) -> str:
+        """Where load_or_compute keeps the table of the graph identified by key"""
+        return os.path.join(directory, f"{key}.npz")
+
+    @classmethod
+    def load_or_compute(cls, graph, key: str, directory: str = ALL_PAIRS_DIR) -> 'AllPairsTable':
+        """
+        Load the table of a graph from disk, or compute it and save it for the next process
+        Args:
+            graph: navigation.CampusGraph
+            key: Identifies the graph: its data version and construction settings
+            directory: Where tables are kept
+        """
+        path = cls.file_path(key, directory)
+        count = graph.get_vertex_count()
+        table = cls.load(path, count)
+        if table is None:
+            table = cls.compute(graph)
+            try:
+                table.save(path)
+            except OSError as e:
+                print(f"Could not save route table {path}: {e}")
+        return table
+
+    def path(self, source: int, target: int) -> Optional[List[int]]:
+        """
+        Shortest route between two nodes, following the next-hop matrix
+        Returns:
+            Path as a list of node ids, or None if the target cannot be reached
+        """
+        next_hop = self.next_hop
+        if next_hop[source, target] < 0:
+            return None
+        path = [source]
+        while path[-1] != target:
+            path.append(int(next_hop[path[-1], target]))
+            if len(path) > len(next_hop):
+                # Ties between single-precision distances can in principle form a loop
+                return None
+        return path
+
+    def distance(self, source: int, target: int) -> float:
+        return float(self.distances[source, target])
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the table"""
+        return self.distances.nbytes + self.next_hop.nbytes
+
+
+def _adjacency_matrix(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    count = len(indptr) - 1
+    matrix = np.full((count, count), np.inf, dtype=np.float32)
+    matrix[np.repeat(np.arange(count), np.diff(indptr)), indices] = weights
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def _floyd_warshall(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    All-pairs shortest distances with a blocked Floyd-Warshall
+
+    Pivots are applied a block at a time. The pivot rows and columns of a block are closed
+    first with plain Floyd-Warshall steps; after that, the rest of the matrix only depends on
+    those panels and is updated one row tile at a time, so each tile receives every pivot of the
+    block while it is still in cache instead of the whole matrix being streamed once per pivot.
+    """
+    matrix = _adjacency_matrix(indptr, indices, weights)
+    count = len(matrix)
+    buffer = np.empty((_ROW_TILE, count), dtype=np.float32)
+    for block_start in range(0, count, _PIVOT_BLOCK):
+        block = slice(block_start, min(block_start + _PIVOT_BLOCK, count))
+        for k in range(block.start, block.stop):
+            np.minimum(matrix[block], matrix[block, k, None] + matrix[k], out=matrix[block])
+            np.minimum(matrix[:, block], matrix[:, k, None] + matrix[k, block], out=matrix[:, block])
+
+        columns = matrix[:, block].copy()
+        rows = matrix[block]
+        for tile_start in range(0, count, _ROW_TILE):
+            tile = matrix[tile_start:tile_start + _ROW_TILE]
+            tile_columns = columns[tile_start:tile_start + _ROW_TILE]
+            candidate = buffer[:len(tile)]
+            for pivot in range(len(rows)):
+                np.add(tile_columns[:, pivot, None], rows[pivot], out=candidate)
+                np.minimum(tile, candidate, out=tile)
+    return matrix
+
+
+def _next_hops(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+               distances: np.ndarray) -> np.ndarray:
+    """First step of every shortest route: the neighbor u of s minimizing w(s, u) + d(u, t)"""
+    count = len(distances)
+    next_hop = np.full((count, count), -1, dtype=np.int32)
+    for source in range(count):
+        neighbors = indices[indptr[source]:indptr[source + 1]]
+        if len(neighbors):
+            via = distances[neighbors] + weights[indptr[source]:indptr[source + 1], None]
+            next_hop[source] = neighbors[np.argmin(via, axis=0)]
+    next_hop[~np.isfinite(distances)] = -1
+    np.fill_diagonal(next_hop, np.arange(count))
+    return next_hop
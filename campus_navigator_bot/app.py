@@ -2,15 +2,13 @@ import streamlit as st
 import json
 import re
 from difflib import get_close_matches
-from utils import load_campus_data, find_best_match, get_location_info, get_timing_info, get_directions, IntentClassifier
-from campus_data import get_all_locations, location_exists
+from utils import find_best_match, get_location_info, get_timing_info, get_directions, IntentClassifier
+from campus_data import get_all_locations, get_store, location_exists
+from campus_registry import get_registry
 from navigation_3d import show_campus_3d_map
 from search import search_locations
 import time
 
-# Load campus data
-campus_data = load_campus_data()
-
 # Set page configuration
 st.set_page_config(
     page_title="Campus Navigator Bot",
@@ -19,6 +17,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Reload campus data (and the graph, search index and map built from it) when the file changes
+@st.cache_resource
+def watch_campus_data():
+    """Start the campus data watcher once per process"""
+    return get_store().watch()
+
+
+watch_campus_data()
+
 # Custom CSS for chat interface
 st.markdown("""
 <style>
@@ -111,7 +118,7 @@ def sanitize_input(user_input):
     return sanitized.strip()
 
 # Sidebar
-def generate_response(user_input):
+def generate_response(user_input, campus=None):
     """Generate a response based on user input using ML classification"""
     # Use the ML classifier to determine intent
     intent = st.session_state.classifier.predict_intent(user_input)
@@ -126,7 +133,7 @@ def generate_response(user_input):
     if any(keyword in user_input_lower for keyword in ['search', 'find locations', 'find places', 'show me all', 'list']):
         search_query = user_input_lower.replace('search', '').replace('find locations', '').replace('find places', '').replace('show me all', '').replace('list', '').strip()
         if search_query:
-            search_results = search_locations(search_query)
+            search_results = search_locations(search_query, campus=campus)
             if search_results:
                 response = f"Found {len(search_results)} location(s) matching '{search_query}':\n\n"
                 for i, loc in enumerate(search_results[:5], 1):  # Show top 5 results
@@ -138,11 +145,11 @@ def generate_response(user_input):
                 return f"Sorry, I couldn't find any locations matching '{search_query}'. Try searching for building names or categories like 'Academic Buildings' or 'Administration Building'."
         else:
             # If no specific search term, show all locations
-            all_locations = get_all_locations()
+            all_locations = get_all_locations(campus)
             if len(all_locations) <= 20:  # Only show if not too many
                 response = f"Here are all {len(all_locations)} locations on campus:\n\n"
                 for i, loc in enumerate(all_locations, 1):
-                    loc_info = get_location_info(loc, campus_data)
+                    loc_info = get_location_info(loc, campus=campus)
                     response += f"{i}. **{loc}** - Category: {loc_info['category'] if loc_info else 'Unknown'}\n"
                 return response
             else:
@@ -151,18 +158,18 @@ def generate_response(user_input):
     # Use ML classification to determine the type of query
     if intent == 'location':
         # Extract possible location names
-        possible_locations = get_all_locations()
+        possible_locations = get_all_locations(campus)
         # Try to find a match in the user input
         for loc in possible_locations:
             if loc.lower() in user_input_lower:
-                location_info = get_location_info(loc, campus_data)
+                location_info = get_location_info(loc, campus=campus)
                 if location_info:
                     return f"**{location_info['name']}** is located at {location_info['location']}.\\n\\nDescription: {location_info['description']}\\n\\nBuildings: {', '.join(location_info['buildings'])}\\n\\nFloors: {', '.join(location_info['floors'])}"
 
         # If no direct match, try fuzzy matching
         best_match = find_best_match(user_input_lower, possible_locations, threshold=0.3)
         if best_match:
-            location_info = get_location_info(best_match, campus_data)
+            location_info = get_location_info(best_match, campus=campus)
             if location_info:
                 return f"**{location_info['name']}** is located at {location_info['location']}.\\n\\nDescription: {location_info['description']}\\n\\nBuildings: {', '.join(location_info['buildings'])}\\n\\nFloors: {', '.join(location_info['floors'])}"
 
@@ -174,7 +181,7 @@ def generate_response(user_input):
 
     elif intent == 'direction':
         # Extract possible start and end locations
-        possible_locations = get_all_locations()
+        possible_locations = get_all_locations(campus)
         found_locations = []
 
         for loc in possible_locations:
@@ -184,7 +191,7 @@ def generate_response(user_input):
         if len(found_locations) >= 2:
             start = found_locations[0]
             end = found_locations[1]
-            directions = get_directions(start, end, campus_data)
+            directions = get_directions(start, end, campus=campus)
             if directions:
                 return f"**Directions from {start.title()} to {end.title()}:**\\n\\n" + "\\n".join([f"{i+1}. {step}" for i, step in enumerate(directions)])
             else:
@@ -199,18 +206,18 @@ def generate_response(user_input):
         # Fallback for unknown queries - use keyword-based detection
         if any(keyword in user_input_lower for keyword in ['where is', 'location', 'find', 'locate', 'at']):
             # Extract possible location names
-            possible_locations = get_all_locations()
+            possible_locations = get_all_locations(campus)
             # Try to find a match in the user input
             for loc in possible_locations:
                 if loc.lower() in user_input_lower:
-                    location_info = get_location_info(loc, campus_data)
+                    location_info = get_location_info(loc, campus=campus)
                     if location_info:
                         return f"**{location_info['name']}** is located at {location_info['location']}.\\n\\nDescription: {location_info['description']}\\n\\nBuildings: {', '.join(location_info['buildings'])}\\n\\nFloors: {', '.join(location_info['floors'])}"
 
             # If no direct match, try fuzzy matching
             best_match = find_best_match(user_input_lower, possible_locations, threshold=0.3)
             if best_match:
-                location_info = get_location_info(best_match, campus_data)
+                location_info = get_location_info(best_match, campus=campus)
                 if location_info:
                     return f"**{location_info['name']}** is located at {location_info['location']}.\\n\\nDescription: {location_info['description']}\\n\\nBuildings: {', '.join(location_info['buildings'])}\\n\\nFloors: {', '.join(location_info['floors'])}"
 
@@ -223,7 +230,7 @@ def generate_response(user_input):
         # Check for direction queries
         elif any(keyword in user_input_lower for keyword in ['how do i get', 'direction', 'navigate', 'go to', 'reach', 'path', 'route']):
             # Extract possible start and end locations
-            possible_locations = get_all_locations()
+            possible_locations = get_all_locations(campus)
             found_locations = []
 
             for loc in possible_locations:
@@ -233,7 +240,7 @@ def generate_response(user_input):
             if len(found_locations) >= 2:
                 start = found_locations[0]
                 end = found_locations[1]
-                directions = get_directions(start, end, campus_data)
+                directions = get_directions(start, end, campus=campus)
                 if directions:
                     return f"**Directions from {start.title()} to {end.title()}:**\\n\\n" + "\\n".join([f"{i+1}. {step}" for i, step in enumerate(directions)])
                 else:
@@ -246,6 +253,9 @@ def generate_response(user_input):
 
 with st.sidebar:
     st.title("📍 Campus Navigator")
+    # Campuses are loaded on first use; add more as data/campuses/<campus id>.json
+    campus_ids = get_registry().campus_ids()
+    campus_id = st.selectbox("Campus", campus_ids) if len(campus_ids) > 1 else campus_ids[0]
     st.markdown("---")
     st.header("About")
     st.markdown("""
@@ -271,6 +281,8 @@ with st.sidebar:
     st.markdown("- You can ask for directions between locations")
     st.markdown("- Ask about timings for various facilities")
 
+campus = get_registry().get(campus_id)
+
 # Main content
 st.markdown('<div class="main-header">📍 Campus Navigator Bot</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Your friendly guide to navigating the campus</div>', unsafe_allow_html=True)
@@ -335,7 +347,7 @@ if submit_button and user_input:
             
             # Generate bot response
             with st.spinner("Bot is thinking..."):
-                response = generate_response(sanitized_input)
+                response = generate_response(sanitized_input, campus)
                 
                 # Check if the response indicates a 3D map request
                 if response == "3D_MAP_REQUEST":
@@ -353,7 +365,7 @@ if submit_button and user_input:
             # We're waiting for 3D location information
             if st.session_state.waiting_for_3d_current:
                 # This is the current location
-                if location_exists(sanitized_input):
+                if location_exists(sanitized_input, campus):
                     st.session_state.waiting_for_3d_current_loc = sanitized_input
                     st.session_state.waiting_for_3d_current = False
                     st.session_state.waiting_for_3d_target = True
@@ -378,7 +390,7 @@ if submit_button and user_input:
                     st.rerun()
             elif st.session_state.waiting_for_3d_target:
                 # This is the target location
-                if location_exists(sanitized_input):
+                if location_exists(sanitized_input, campus):
                     st.session_state.waiting_for_3d_target_loc = sanitized_input
                     st.session_state.waiting_for_3d_target = False
                     
@@ -393,7 +405,7 @@ if submit_button and user_input:
                     
                     # Show the 3D map (this will open in a new tab)
                     try:
-                        show_campus_3d_map(st.session_state.waiting_for_3d_current_loc, st.session_state.waiting_for_3d_target_loc)
+                        show_campus_3d_map(st.session_state.waiting_for_3d_current_loc, st.session_state.waiting_for_3d_target_loc, campus)
                         success_msg = f"3D map visualization created successfully! Check your browser for the interactive 3D map."
                         st.session_state.messages.append({"role": "assistant", "content": success_msg})
                         st.markdown(f'<div class="bot-message">Bot: {success_msg}</div>', unsafe_allow_html=True)
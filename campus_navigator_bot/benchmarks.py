@@ -0,0 +1,467 @@
+"""
+Benchmarks for the campus data and navigation code
+
+Usage:
+    python benchmarks.py snapshot [--sizes 1000 10000 100000]
+    python benchmarks.py loaders [--sizes 1000 10000 100000]
+    python benchmarks.py routing [--sizes 10000 20000] [--queries 20] [--reference-queries 2]
+    python benchmarks.py contraction [--sizes 2000 10000] [--queries 50]
+    python benchmarks.py graph [--sizes 1000 10000 100000] [--reference-max 20000]
+    python benchmarks.py memory [--size 100000]
+    python benchmarks.py algorithms [--size 300] [--queries 200]
+    python benchmarks.py closures [--size 300]
+    python benchmarks.py reload [--size 1000]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from generate_campus import write_campus
+from snapshot import compile_snapshot
+
+
+def _max_rss_kb() -> int:
+    # ru_maxrss survives exec() and would report the parent's peak, so prefer VmHWM on Linux
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cold_start(path: str, mode: str) -> Dict:
+    """Load a campus data file once in this process and report time and memory"""
+    from campus_data import CampusDataStore
+
+    rss_before = _max_rss_kb()
+    start = time.perf_counter()
+    if mode == 'document':
+        # What the JSON loader did before streaming: parse the whole document, then convert it
+        from campus_data import CampusState
+        with open(path, 'rb') as f:
+            raw = f.read()
+        state = CampusState.from_document(json.loads(raw), '')
+        del raw
+    else:
+        store = CampusDataStore(path, use_snapshot=(mode == 'snapshot'))
+        state = store.current()
+    state.by_name.get(state.names[-1].lower())
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'rss_kb': _max_rss_kb() - rss_before}
+
+
+def _run_cold_start(path: str, mode: str) -> Dict:
+    # Every measurement runs in a fresh interpreter so nothing is cached between them
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '_cold-start', path, mode],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return json.loads(output)
+
+
+def benchmark_snapshot(sizes: List[int]):
+    """Compare cold-start time and peak RSS growth of the JSON and snapshot loaders"""
+    print(f"{'locations':>10} {'mode':>9} {'load ms':>9} {'RSS MiB':>8} {'file MiB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = os.path.join(directory, f"campus_{size}.json")
+            write_campus(json_path, size)
+            snapshot_path = compile_snapshot(json_path)
+            for mode, path in (('json', json_path), ('snapshot', snapshot_path)):
+                result = _run_cold_start(json_path, mode)
+                print(f"{size:>10} {mode:>9} {result['seconds'] * 1000:>9.1f} "
+                      f"{result['rss_kb'] / 1024:>8.1f} {os.path.getsize(path) / 2 ** 20:>9.1f}")
+
+
+def benchmark_loaders(sizes: List[int]):
+    """Compare the whole-document JSON loader with the streaming one"""
+    print(f"{'locations':>10} {'mode':>9} {'load ms':>9} {'RSS MiB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = os.path.join(directory, f"campus_{size}.json")
+            write_campus(json_path, size)
+            for mode in ('document', 'json'):
+                result = _run_cold_start(json_path, mode)
+                print(f"{size:>10} {mode:>9} {result['seconds'] * 1000:>9.1f} {result['rss_kb'] / 1024:>8.1f}")
+
+
+def _linear_scan_dijkstra(graph, start: str, end: str) -> Tuple[Optional[List[str]], float]:
+    """The previous O(V²) Dijkstra, which scanned all unvisited locations for the next one"""
+    distances = {vertex: float('inf') for vertex in graph.vertices}
+    previous = {vertex: None for vertex in graph.vertices}
+    unvisited = set(graph.vertices.keys())
+    distances[start] = 0
+    while unvisited:
+        current = min(unvisited, key=lambda vertex: distances[vertex])
+        if current == end or distances[current] == float('inf'):
+            break
+        for neighbor, weight in graph.edges[current]:
+            if neighbor in unvisited:
+                new_distance = distances[current] + weight
+                if new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    previous[neighbor] = current
+        unvisited.remove(current)
+    path = []
+    current = end
+    while current is not None:
+        path.append(current)
+        current = previous[current]
+    path.reverse()
+    return (path, distances[end]) if path[0] == start else (None, float('inf'))
+
+
+def _time_queries(search, graph, pairs: List[Tuple[str, str]]) -> Tuple[float, List[float], float]:
+    """Average seconds and expanded nodes per query, and the distances found"""
+    stats = {}
+    start = time.perf_counter()
+    if search is _linear_scan_dijkstra:
+        distances = [search(graph, origin, destination)[1] for origin, destination in pairs]
+    else:
+        distances = [search(graph, origin, destination, stats)[1] for origin, destination in pairs]
+    count = max(len(pairs), 1)
+    return (time.perf_counter() - start) / count, distances, stats.get('expanded', 0) / count
+
+
+def benchmark_routing(sizes: List[int], queries: int, reference_queries: int):
+    """
+    Compare heap-based, bidirectional Dijkstra and A* with the previous linear-scan Dijkstra on
+    random queries; 'expanded' is the number of locations each search settles per query
+    """
+    from campus_data import CampusDataStore
+    from navigation import a_star, bidirectional_dijkstra, dijkstra, get_campus_graph
+
+    print(f"{'locations':>10} {'edges':>9} {'build s':>8} {'search':>13} {'queries':>8} {'ms/query':>9} "
+          f"{'expanded':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size)
+            started = time.perf_counter()
+            graph = get_campus_graph(CampusDataStore(json_path, use_snapshot=False))
+            build_seconds = time.perf_counter() - started
+            edge_count = graph.build_stats['edges']
+
+            rng = random.Random(size)
+            names = list(graph.vertices)
+            pairs = [tuple(rng.sample(names, 2)) for _ in range(queries)]
+            searches = (
+                ('linear scan', _linear_scan_dijkstra, pairs[:reference_queries]),
+                ('dijkstra', dijkstra, pairs),
+                ('bidirectional', bidirectional_dijkstra, pairs),
+                ('astar', a_star, pairs),
+            )
+            expected = {}
+            for name, search, search_pairs in searches:
+                seconds, distances, expanded = _time_queries(search, graph, search_pairs)
+                if any(abs(expected.get(pair, distance) - distance) > 1e-6
+                       for pair, distance in zip(search_pairs, distances)):
+                    raise AssertionError(f"{name} disagrees with the other searches")
+                expected.update(zip(search_pairs, distances))
+                expanded_text = f"{expanded:>9.0f}" if search is not _linear_scan_dijkstra else f"{'':>9}"
+                print(f"{size:>10} {edge_count:>9} {build_seconds:>8.2f} {name:>13} {len(search_pairs):>8} "
+                      f"{seconds * 1000:>9.1f} {expanded_text}")
+
+
+def benchmark_contraction(sizes: List[int], queries: int):
+    """Contraction hierarchy build time and size, and its queries compared with Dijkstra and A*"""
+    from campus_data import CampusDataStore
+    from contraction import ContractionHierarchy
+    from navigation import _route_result, a_star, dijkstra, get_campus_graph
+
+    print(f"{'locations':>10} {'build s':>8} {'shortcuts':>10} {'search':>9} {'ms/query':>9} {'expanded':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size)
+            graph = get_campus_graph(CampusDataStore(json_path, use_snapshot=False))
+            started = time.perf_counter()
+            hierarchy = ContractionHierarchy.build(graph)
+            build_seconds = time.perf_counter() - started
+
+            def contraction_search(graph, start, end, stats):
+                return _route_result(graph, hierarchy.path(graph.ids[start], graph.ids[end], stats))
+
+            rng = random.Random(size)
+            pairs = [tuple(rng.sample(graph.names, 2)) for _ in range(queries)]
+            expected = None
+            for name, search in (('dijkstra', dijkstra), ('astar', a_star), ('ch', contraction_search)):
+                seconds, distances, expanded = _time_queries(search, graph, pairs)
+                if expected is not None and any(abs(a - b) > 1e-6 for a, b in zip(expected, distances)):
+                    raise AssertionError(f"{name} disagrees with dijkstra")
+                expected = distances
+                print(f"{size:>10} {build_seconds:>8.1f} {hierarchy.shortcut_count:>10} {name:>9} "
+                      f"{seconds * 1000:>9.2f} {expanded:>9.0f}")
+
+
+def check_algorithms(size: int, queries: int):
+    """
+    Regression check: every search in ROUTING_ALGORITHMS must find routes as short as Dijkstra's
+    on a small campus, including pairs without a route
+    """
+    from campus_data import CampusState
+    from navigation import ROUTING_ALGORITHMS, dijkstra
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size, seed=size)
+        with open(json_path, 'r', encoding='utf-8') as file:
+            # An unversioned state keeps the all-pairs table and the hierarchy out of data/route_tables
+            state = CampusState.from_document(json.load(file), '')
+    graph = state.derived('campus_graph')
+    # Both are computed in the background; until then their searches fall back to A*
+    table_loader = state.derived('all_pairs_table')
+    hierarchy_loader = state.derived('contraction_hierarchy')
+    deadline = time.perf_counter() + 60
+    while table_loader.table is None or hierarchy_loader.hierarchy is None:
+        if time.perf_counter() > deadline:
+            raise AssertionError("the all-pairs table and contraction hierarchy were not ready within 60 seconds")
+        time.sleep(0.05)
+
+    rng = random.Random(size)
+    pairs = [tuple(rng.sample(graph.names, 2)) for _ in range(queries)]
+    expected = [dijkstra(graph, start, end)[1] for start, end in pairs]
+    print(f"{'search':>13} {'queries':>8} {'no route':>9}")
+    for name, search in ROUTING_ALGORITHMS.items():
+        for (start, end), distance in zip(pairs, expected):
+            path, found = search(graph, start, end)
+            if found != distance and not abs(found - distance) <= 1e-6:
+                raise AssertionError(f"{name} finds {found} from {start} to {end}, dijkstra {distance}")
+            if (path is None) != (distance == float('inf')) or path and (path[0], path[-1]) != (start, end):
+                raise AssertionError(f"{name} returns the wrong path from {start} to {end}: {path}")
+        unreachable = sum(distance == float('inf') for distance in expected)
+        print(f"{name:>13} {len(pairs):>8} {unreachable:>9}")
+
+
+def check_closures(size: int):
+    """
+    Regression check: a closed location is never snapped to, listed as nearby or routed through,
+    and a route from a point next to it starts at the nearest open location
+    """
+    from campus_data import CampusState
+    import navigation
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size, seed=size)
+        with open(json_path, 'r', encoding='utf-8') as file:
+            state = CampusState.from_document(json.load(file), '')
+    graph = state.derived('campus_graph')
+    rng = random.Random(size)
+    closed, end = rng.sample(graph.names, 2)
+    point = graph.node_coordinates[graph.ids[closed]] + 0.1
+    if navigation.snap_to_graph(point, state)[0] != closed:
+        raise AssertionError(f"the point next to {closed} does not snap to it before the closure")
+
+    navigation.close_location(closed, state)
+    start, offset = navigation.snap_to_graph(point, state)
+    if start in (None, closed):
+        raise AssertionError(f"the point next to {closed} snaps to {start} after the closure")
+    path, distance = navigation.find_route_from_point(point, end, state)
+    if path is None or path[0] != start or closed in path:
+        raise AssertionError(f"no route around {closed} from the point next to it: {path}")
+    expected = navigation.find_route(start, end, state)[1] + offset
+    if abs(distance - expected) > 1e-6:
+        raise AssertionError(f"the route from the point is {distance} long, expected {expected}")
+    nearby = navigation.nearest_locations(point, 5, campus=state)
+    nearby += navigation.locations_within(point, navigation.CONNECTION_RADIUS, state)
+    if any(name == closed for name, _ in nearby):
+        raise AssertionError(f"{closed} is still listed as a nearby location")
+
+    navigation.reopen_location(closed, state)
+    if navigation.snap_to_graph(point, state)[0] != closed:
+        raise AssertionError(f"the point next to {closed} does not snap to it after reopening")
+    print(f"closed {closed}: points next to it snap to {start}, {offset:.2f} away, and route from there")
+
+
+def check_reload(size: int):
+    """
+    Regression check: after a location is moved in the data file, cached routes through it are
+    searched again and cached routes far away from it are still served from the cache
+    """
+    import math
+    from campus_data import CampusDataStore
+    import navigation
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size, seed=size)
+        # A* keeps the all-pairs table, and with it data/route_tables, out of the check
+        store = CampusDataStore(json_path, use_snapshot=False)
+        graph = navigation.get_campus_graph(store)
+        rng = random.Random(size)
+        routes = {}
+        while len(routes) < 50:
+            start, end = rng.sample(graph.names, 2)
+            path = navigation.find_route(start, end, store, 'astar')[0]
+            if path is not None and len(path) >= 3:
+                routes[start, end] = path
+        (start, end), path = next(iter(routes.items()))
+        moved = path[len(path) // 2]
+        origin = graph.positions[graph.ids[moved]]
+        far = [pair for pair, other in routes.items()
+               if all(math.dist(origin, graph.positions[graph.ids[name]]) > 5 * navigation.CONNECTION_RADIUS
+                      for name in other)]
+        if not far:
+            raise AssertionError("no cached route far away from the moved location")
+
+        with open(json_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        for location in data['locations'].values():
+            if location['name'] == moved:
+                location['coordinates'][0] += 1.0
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        later = time.time() + 10
+        os.utime(json_path, (later, later))
+
+        for pair in far:
+            stats = {}
+            distance = navigation.find_route(*pair, store, 'astar', stats)[1]
+            if stats:
+                raise AssertionError(f"the route {pair} far from the moved location was searched again")
+            if abs(distance - navigation.dijkstra(navigation.get_campus_graph(store), *pair)[1]) > 1e-6:
+                raise AssertionError(f"the cached route {pair} is no longer the shortest")
+        if store.load_count != 2:
+            raise AssertionError("the edited data file was not reloaded")
+        stats = {}
+        navigation.find_route(start, end, store, 'astar', stats)
+        if not stats:
+            raise AssertionError(f"the route {start, end} through the moved location was served from the cache")
+    print(f"moved {moved}: {len(far)} of {len(routes)} cached routes far from it were kept")
+
+
+def _pairwise_edge_count(coords) -> int:
+    """The previous graph construction, which compared every pair of locations"""
+    import numpy as np
+    from navigation import CONNECTION_RADIUS
+
+    edge_count = 0
+    for i in range(len(coords)):
+        delta = coords[i + 1:] - coords[i]
+        distances = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        edge_count += int(np.count_nonzero(distances <= CONNECTION_RADIUS))
+    return edge_count
+
+
+def benchmark_graph(sizes: List[int], reference_max: int):
+    """Graph build time and edge counts of the grid construction, and of the old pairwise one"""
+    import numpy as np
+    from campus_data import CampusDataStore
+    from navigation import CampusGraph
+
+    print(f"{'locations':>10} {'build':>9} {'seconds':>8} {'edges':>9} {'knn':>6} {'bridges':>8} "
+          f"{'components':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size, floors=4)
+            state = CampusDataStore(json_path, use_snapshot=False).current()
+            for connectivity in ('radius', 'knn'):
+                stats = CampusGraph(state, connectivity).build_stats
+                print(f"{size:>10} {connectivity:>9} {stats['seconds']:>8.2f} {stats['edges']:>9} "
+                      f"{stats['knn_edges']:>6} {stats['bridge_edges']:>8} {stats['components']:>10}")
+            if size <= reference_max:
+                coords = state.coordinate_store.take(state.coordinate_store.index).astype(np.float64)
+                started = time.perf_counter()
+                edge_count = _pairwise_edge_count(coords)
+                print(f"{size:>10} {'pairwise':>9} {time.perf_counter() - started:>8.2f} {edge_count:>9}")
+
+
+def benchmark_memory(size: int):
+    """Memory of the CSR adjacency arrays vs name-keyed adjacency lists for the same graph"""
+    from campus_data import CampusDataStore
+    from navigation import CampusGraph
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = write_campus(os.path.join(directory, f"campus_{size}.json"), size, floors=4)
+        graph = CampusGraph(CampusDataStore(json_path, use_snapshot=False).current())
+
+    csr_bytes = graph.indptr.nbytes + graph.indices.nbytes + graph.weights.nbytes
+    # The dict of (neighbor name, distance) tuples the graph used before; the name strings
+    # themselves are shared with the campus data and not counted for either representation
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph.edges
+    dict_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{size} locations, {graph.build_stats['edges']} edges")
+    print(f"{'representation':>26} {'MiB':>8} {'bytes/edge':>11}")
+    for name, usage in (('CSR (int32/float32)', csr_bytes), ('name-keyed dict of tuples', dict_bytes)):
+        print(f"{name:>26} {usage / 2 ** 20:>8.1f} {usage / len(graph.indices):>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Campus navigator benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help="JSON vs snapshot cold start")
+    snapshot_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    loaders_parser = subparsers.add_parser('loaders', help="whole-document vs streaming JSON loading")
+    loaders_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    routing_parser = subparsers.add_parser('routing', help="linear-scan vs heap vs bidirectional Dijkstra vs A*")
+    routing_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 20000])
+    routing_parser.add_argument('--queries', type=int, default=20)
+    routing_parser.add_argument('--reference-queries', type=int, default=2,
+                                 help="queries also run with the slow linear-scan version")
+
+    contraction_parser = subparsers.add_parser('contraction', help="contraction hierarchy vs Dijkstra and A*")
+    contraction_parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 10000])
+    contraction_parser.add_argument('--queries', type=int, default=50)
+
+    graph_parser = subparsers.add_parser('graph', help="grid vs pairwise graph construction")
+    graph_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    graph_parser.add_argument('--reference-max', type=int, default=20000,
+                              help="largest size also built with the slow pairwise construction")
+
+    memory_parser = subparsers.add_parser('memory', help="CSR vs dict adjacency memory")
+    memory_parser.add_argument('--size', type=int, default=100000)
+
+    algorithms_parser = subparsers.add_parser('algorithms', help="check every routing algorithm against Dijkstra")
+    algorithms_parser.add_argument('--size', type=int, default=300)
+    algorithms_parser.add_argument('--queries', type=int, default=200)
+
+    closures_parser = subparsers.add_parser('closures', help="check snapping and routing next to a closed location")
+    closures_parser.add_argument('--size', type=int, default=300)
+
+    reload_parser = subparsers.add_parser('reload', help="check the route cache across a data file change")
+    reload_parser.add_argument('--size', type=int, default=1000)
+
+    cold_start_parser = subparsers.add_parser('_cold-start')
+    cold_start_parser.add_argument('path')
+    cold_start_parser.add_argument('mode', choices=['document', 'json', 'snapshot'])
+
+    args = parser.parse_args()
+    if args.benchmark == 'snapshot':
+        benchmark_snapshot(args.sizes)
+    elif args.benchmark == 'loaders':
+        benchmark_loaders(args.sizes)
+    elif args.benchmark == 'routing':
+        benchmark_routing(args.sizes, args.queries, args.reference_queries)
+    elif args.benchmark == 'contraction':
+        benchmark_contraction(args.sizes, args.queries)
+    elif args.benchmark == 'graph':
+        benchmark_graph(args.sizes, args.reference_max)
+    elif args.benchmark == 'memory':
+        benchmark_memory(args.size)
+    elif args.benchmark == 'algorithms':
+        check_algorithms(args.size, args.queries)
+    elif args.benchmark == 'closures':
+        check_closures(args.size)
+    elif args.benchmark == 'reload':
+        check_reload(args.size)
+    elif args.benchmark == '_cold-start':
+        print(json.dumps(cold_start(args.path, args.mode)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,95 +1,707 @@
-import json
-from typing import Dict, List, Optional, Tuple
+import hashlib
+import math
+import os
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 
-def load_campus_data():
-    """Load campus data from JSON file"""
-    with open('data/campus_data.json', 'r') as f:
-        return json.load(f)
+import snapshot
+import stream_loader
 
 
-def get_coordinates_map() -> Dict[str, List[float]]:
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'campus_data.json')
+
+
+def normalize_key(text: str) -> str:
+    """Case-fold a name or category and collapse whitespace so it can be used as an index key"""
+    return ' '.join(text.casefold().split())
+
+
+class CoordinateStore:
+    """
+    Columnar storage for location coordinates.
+
+    All coordinates live in one read-only float32 array of shape (N, 3) where row i belongs to
+    names[i]. Accessors hand out views of that array instead of building per-call lists, so
+    distance and plotting code can share one copy of the coordinates.
+    """
+
+    def __init__(self, names: Sequence[str], coordinates):
+        self.names = tuple(names)
+        # np.asarray keeps memory-mapped snapshot arrays zero-copy
+        coords = np.asarray(coordinates, dtype=np.float32).reshape(len(self.names), 3)
+        coords.flags.writeable = False
+        self.coords = coords
+
+        self.index = dict(zip(self.names, range(len(self.names))))
+        if len(self.index) != len(self.names):
+            # The first row wins for duplicated names, like the name index
+            self.index = {}
+            for row, name in enumerate(self.names):
+                self.index.setdefault(name, row)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.coords[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.coords[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.coords[:, 2]
+
+    def row(self, name: str) -> Optional[int]:
+        """Get the row of a location name or None if it is unknown"""
+        return self.index.get(name)
+
+    def coordinates_of(self, name: str) -> Optional[np.ndarray]:
+        """Get a read-only [x, y, z] view for a location name or None if it is unknown"""
+        row = self.index.get(name)
+        if row is None:
+            return None
+        return self.coords[row]
+
+    def take(self, names: Iterable[str]) -> np.ndarray:
+        """Get an (len(names), 3) array with the coordinates of the given locations"""
+        return self.coords[[self.index[name] for name in names]]
+
+    def distance(self, name1: str, name2: str) -> float:
+        """Straight-line distance between two locations, or float('inf') if either is unknown"""
+        row1 = self.index.get(name1)
+        row2 = self.index.get(name2)
+        if row1 is None or row2 is None:
+            return float('inf')
+        return math.dist(self.coords[row1].tolist(), self.coords[row2].tolist())
+
+    def distances_from(self, point: Sequence[float]) -> np.ndarray:
+        """Straight-line distances from a point to every location, in row order"""
+        delta = self.coords - np.asarray(point, dtype=np.float32)
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+    def as_dict(self) -> Dict[str, List[float]]:
+        """Build a name -> [x, y, z] dictionary (allocates; prefer the array accessors)"""
+        return {name: self.coords[row].tolist() for name, row in self.index.items()}
+
+
+_RECORD_FIELDS = ('name', 'category', 'coordinates')
+
+# Builders and incremental updaters for structures derived from the campus data
+# (graph, search index, figures, ...)
+_derived_builders: Dict[str, Callable[['CampusState'], Any]] = {}
+_derived_updaters: Dict[str, Callable[[Any, 'CampusState', 'CampusDiff'], Any]] = {}
+# Structures that CampusState.warm() leaves alone until they are first used
+_lazy_derived = set()
+
+
+def register_derived(key: str, builder: Callable[['CampusState'], Any],
+                     updater: Optional[Callable[[Any, 'CampusState', 'CampusDiff'], Any]] = None,
+                     eager: bool = True):
+    """
+    Register a structure that is derived from the campus data
+    Args:
+        key: Name of the structure, used with CampusState.derived(key)
+        builder: Function building the structure from a CampusState
+        updater: Optional function (old_structure, new_state, diff) -> new_structure that
+            derives the structure for a new data version from the previous one. It must not
+            modify old_structure, which may still be in use.
+        eager: Build the structure in CampusState.warm(); expensive optional structures pass
+            False so that they are only built for campuses that actually use them
+    The structure is built lazily once per data version. When the data file changes, structures
+    that were built for the previous version are carried over with the updater (or rebuilt),
+    and, when the file is watched, this happens in the background before the swap.
+    """
+    _derived_builders[key] = builder
+    if updater is not None:
+        _derived_updaters[key] = updater
+    else:
+        _derived_updaters.pop(key, None)
+    if eager:
+        _lazy_derived.discard(key)
+    else:
+        _lazy_derived.add(key)
+
+
+class CampusState:
+    """
+    One version of the campus data in columnar form together with the structures derived from it.
+    Row i of every column belongs to the same location. A state is never modified after
+    construction, so readers can keep using it while a newer version is being loaded.
+    """
+
+    def __init__(self, version: str, meta: Dict, ids: Sequence[str], names: Sequence[str],
+                 categories: Sequence[str], coordinates, extras: Optional[Dict[int, Dict]] = None,
+                 name_index: Optional[Dict[str, int]] = None,
+                 category_index: Optional[Dict[str, Sequence[int]]] = None):
+        self.version = version
+        self.meta = meta
+        self.ids = ids
+        self.names = names
+        self.categories = categories
+        self.extras = extras or {}
+        self.coordinate_store = CoordinateStore(names, coordinates)
+        self.by_id = dict(zip(ids, range(len(ids))))
+
+        # Hash indexes (key -> row) so that lookups do not scan every location. The first
+        # location wins when two entries share a name, which matches the old linear scan.
+        if name_index is None:
+            name_index = {}
+            for row, name in enumerate(names):
+                name_index.setdefault(normalize_key(name), row)
+                for alias in self.extras.get(row, {}).get('aliases', []):
+                    name_index.setdefault(normalize_key(alias), row)
+        if category_index is None:
+            category_index = {}
+            for row, category in enumerate(categories):
+                category_index.setdefault(normalize_key(category), []).append(row)
+        self.by_name = name_index
+        self.by_category = category_index
+
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    @classmethod
+    def from_document(cls, data: Dict, version: str) -> 'CampusState':
+        """Build a state from a parsed campus_data.json document"""
+        builder = _StateBuilder()
+        for location_id, location_info in data['locations'].items():
+            builder.add(location_id, location_info)
+        meta = {key: value for key, value in data.items() if key != 'locations'}
+        return builder.build(version, meta)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'CampusState':
+        """
+        Build a state by streaming a campus_data.json file
+        Locations go straight into the columnar representation, so peak memory stays close to
+        the size of the final state instead of the size of the parsed document.
+        """
+        builder = _StateBuilder()
+        meta, version = stream_loader.read_campus_stream(path, builder.add)
+        return builder.build(version, meta)
+
+    def record(self, row: int) -> Dict:
+        """Build the location dictionary for a row, in the same shape as the JSON file"""
+        location_info = {
+            'name': self.names[row],
+            'category': self.categories[row],
+            'coordinates': self.coordinate_store.coords[row].tolist()
+        }
+        location_info.update(self.extras.get(row, {}))
+        return location_info
+
+    def derived(self, key: str) -> Any:
+        """Get a structure registered with register_derived, building it on first use"""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = _derived_builders[key](self)
+            return self._derived[key]
+
+    def replace_derived(self, values: Dict[str, Any]):
+        """
+        Swap derived structures of this version for new ones at runtime, e.g. the campus graph
+        after a closure (see navigation.set_edge_factor). Readers that already hold the old
+        structures keep using them; every later derived() call gets the new ones.
+        """
+        with self._derived_lock:
+            self._derived.update(values)
+
+    def warm(self):
+        """Build every registered derived structure, except the ones registered with eager=False"""
+        for key in list(_derived_builders):
+            if key not in _lazy_derived:
+                self.derived(key)
+
+    def carry_over(self, previous: 'CampusState'):
+        """
+        Derive the structures that were built for a previous version of the data, incrementally
+        where an updater is registered and from scratch otherwise
+        """
+        diff = None
+        for key, old_value in list(previous._derived.items()):
+            if key in self._derived:
+                continue
+            updater = _derived_updaters.get(key)
+            if updater is None:
+                self.derived(key)
+                continue
+            if diff is None:
+                diff = CampusDiff(previous, self)
+            with self._derived_lock:
+                if key not in self._derived:
+                    self._derived[key] = updater(old_value, self, diff)
+
+    def get_location_by_id(self, location_id: str) -> Optional[Dict]:
+        row = self.by_id.get(str(location_id))
+        return None if row is None else self.record(row)
+
+    def get_location_by_name(self, location_name: str) -> Optional[Dict]:
+        row = self.by_name.get(normalize_key(location_name))
+        return None if row is None else self.record(row)
+
+    def get_all_locations(self) -> List[str]:
+        return list(self.names)
+
+    def location_exists(self, location_name: str) -> bool:
+        return normalize_key(location_name) in self.by_name
+
+    def get_locations_by_category(self, category: str) -> List[Dict]:
+        matching_locations = []
+        for row in self.by_category.get(normalize_key(category), []):
+            matching_locations.append({
+                'id': self.ids[row],
+                'name': self.names[row],
+                'category': self.categories[row],
+                'coordinates': self.coordinate_store.coords[row].tolist()
+            })
+        return matching_locations
+
+    @cached_property
+    def _base_memory_usage(self) -> int:
+        strings = sum(map(sys.getsizeof, self.ids)) + sum(map(sys.getsizeof, self.names))
+        containers = sum(map(sys.getsizeof, (
+            self.ids, self.names, self.categories, self.by_id, self.by_name, self.by_category,
+            self.coordinate_store.index
+        )))
+        return self.coordinate_store.coords.nbytes + strings + containers
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes held by this data version, including derived structures
+        that report their own size through a memory_usage() method
+        """
+        # A structure may be registered under several keys (the graph without overrides is also the base graph)
+        values = {id(value): value for value in list(self._derived.values())}.values()
+        derived = sum(value.memory_usage() for value in values if hasattr(value, 'memory_usage'))
+        return self._base_memory_usage + derived
+
+    @cached_property
+    def data(self) -> Dict:
+        # The full document is only materialized for callers that ask for it
+        document = dict(self.meta)
+        document['locations'] = {location_id: self.record(row) for row, location_id in enumerate(self.ids)}
+        return document
+
+    @cached_property
+    def coordinates_map(self) -> Dict[str, List[float]]:
+        # Only built for callers that still want the dictionary form
+        return self.coordinate_store.as_dict()
+
+
+class _StateBuilder:
+    """Accumulates locations one at a time into the columns of a CampusState"""
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.categories = []
+        self.coordinates = array('f')
+        self.extras = {}
+        # Category names repeat across thousands of rows; keep one string object per category
+        self._category_names = {}
+
+    def add(self, location_id: str, location_info: Dict):
+        coordinates = location_info['coordinates']
+        if len(coordinates) != 3:
+            raise ValueError(f"Location {location_id} must have [x, y, z] coordinates, got {coordinates}")
+        category = location_info['category']
+
+        row = len(self.ids)
+        self.ids.append(str(location_id))
+        self.names.append(location_info['name'])
+        self.categories.append(self._category_names.setdefault(category, category))
+        self.coordinates.extend(coordinates)
+        extra = {key: value for key, value in location_info.items() if key not in _RECORD_FIELDS}
+        if extra:
+            self.extras[row] = extra
+
+    def build(self, version: str, meta: Dict) -> CampusState:
+        if self.coordinates:
+            coordinates = np.frombuffer(self.coordinates, dtype=np.float32)
+        else:
+            coordinates = np.empty((0, 3), dtype=np.float32)
+        return CampusState(version, meta, self.ids, self.names, self.categories, coordinates, self.extras)
+
+
+def _file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class CampusDiff:
+    """
+    Differences between two versions of the campus data, matched by location id
+
+    Attributes:
+        added: ids only present in the new version
+        removed: ids only present in the old version
+        changed: ids present in both whose name, category, coordinates or extra fields differ
+        removed_names: old names of removed and changed locations
+        added_names: new names of added and changed locations
+    """
+
+    def __init__(self, old: CampusState, new: CampusState):
+        self.old = old
+        self.new = new
+        self.added = [location_id for location_id in new.ids if location_id not in old.by_id]
+        self.removed = [location_id for location_id in old.ids if location_id not in new.by_id]
+
+        common = [location_id for location_id in new.ids if location_id in old.by_id]
+        old_rows = [old.by_id[location_id] for location_id in common]
+        new_rows = [new.by_id[location_id] for location_id in common]
+        moved = np.any(
+            old.coordinate_store.coords[old_rows] != new.coordinate_store.coords[new_rows], axis=1
+        ).tolist() if common else []
+        self.changed = [
+            location_id
+            for location_id, old_row, new_row, is_moved in zip(common, old_rows, new_rows, moved)
+            if is_moved
+            or old.names[old_row] != new.names[new_row]
+            or old.categories[old_row] != new.categories[new_row]
+            or old.extras.get(old_row) != new.extras.get(new_row)
+        ]
+
+        self.removed_names = {old.names[old.by_id[location_id]] for location_id in self.removed + self.changed}
+        self.added_names = {new.names[new.by_id[location_id]] for location_id in self.added + self.changed}
+
+    @property
+    def affected_names(self) -> set:
+        """Names of every location that was added, removed or changed, under old and new names"""
+        return self.removed_names | self.added_names
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __repr__(self) -> str:
+        return f"CampusDiff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})"
+
+
+class CampusDataStore:
+    """
+    Process-wide cache of the campus data file.
+
+    The JSON file is parsed once and only parsed again when its modification time or size
+    changes. If the content hash of the changed file is identical to the loaded version the
+    cached data is kept. When a compiled snapshot (see snapshot.py) exists next to the JSON
+    file and is newer than it, the snapshot is memory-mapped instead of parsing the JSON.
+    All returned structures are shared between callers and must not be modified.
+
+    After watch() is called the file is no longer checked on every lookup. A background
+    CampusDataWatcher polls it instead and only swaps in a new version once all derived
+    structures have been rebuilt, so requests never wait for or observe a half-built reload.
+    """
+
+    def __init__(self, path: str = DATA_FILE, use_snapshot: bool = True):
+        self.path = path
+        self.snapshot_path = snapshot.snapshot_path_for(path) if use_snapshot else None
+        self.load_count = 0
+        self.hit_count = 0
+        self._state = None
+        self._file_signature = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+
+    def _signature(self) -> Tuple:
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            snapshot_stat = os.stat(self.snapshot_path)
+            signature += (snapshot_stat.st_mtime_ns, snapshot_stat.st_size)
+        return signature
+
+    def _read_state(self, signature: Tuple) -> CampusState:
+        """Load the newest usable representation of the data file"""
+        # A snapshot is only trusted if it was written after the JSON file was last modified
+        if len(signature) > 2 and signature[2] >= signature[0]:
+            try:
+                columns = snapshot.read_snapshot(self.snapshot_path)
+            except (OSError, ValueError) as e:
+                print(f"Could not load snapshot {self.snapshot_path}, falling back to JSON: {e}")
+            else:
+                if self._state is not None and columns['version'] == self._state.version:
+                    return self._state
+                return CampusState(**columns)
+
+        if self._state is not None and _file_sha1(self.path) == self._state.version:
+            return self._state
+        return CampusState.from_file(self.path)
+
+    def _current_state(self) -> CampusState:
+        """Return the cached state, reloading it first if the file has changed on disk"""
+        state = self._state
+        if state is not None and self._watcher is not None:
+            # The watcher keeps the state up to date
+            self.hit_count += 1
+            return state
+
+        signature = self._signature()
+        if state is not None and signature == self._file_signature:
+            self.hit_count += 1
+            return state
+
+        with self._lock:
+            # Another thread may have reloaded the file while we were waiting
+            if self._state is not None and signature == self._file_signature:
+                self.hit_count += 1
+                return self._state
+
+            state = self._read_state(signature)
+            if state is self._state:
+                # Touched but not changed
+                self.hit_count += 1
+            else:
+                if self._state is not None:
+                    state.carry_over(self._state)
+                self._state = state
+                self.load_count += 1
+            self._file_signature = signature
+            return state
+
+    def refresh(self) -> bool:
+        """
+        Reload the data file if it changed on disk. The new version and all registered derived
+        structures are built before it replaces the current one in a single assignment.
+        Returns:
+            True if a new version was swapped in
+        """
+        with self._refresh_lock:
+            signature = self._signature()
+            if signature == self._file_signature:
+                return False
+
+            state = self._read_state(signature)
+            if state is not self._state:
+                if self._state is not None:
+                    state.carry_over(self._state)
+                state.warm()
+
+            with self._lock:
+                changed = state is not self._state
+                if changed:
+                    self._state = state
+                    self.load_count += 1
+                self._file_signature = signature
+            return changed
+
+    def watch(self, interval: float = 2.0) -> 'CampusDataWatcher':
+        """Start reloading the data file in the background when it changes"""
+        with self._refresh_lock:
+            if self._watcher is None:
+                self._current_state().warm()
+                self._watcher = CampusDataWatcher(self, interval)
+                self._watcher.start()
+            return self._watcher
+
+    def stop_watching(self):
+        """Stop the background watcher and go back to checking the file on every lookup"""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    def current(self) -> CampusState:
+        """Return the current version of the campus data; hold on to it for a consistent view"""
+        return self._current_state()
+
+    @contextmanager
+    def holding_reloads(self) -> Iterator[CampusState]:
+        """
+        Context manager yielding the current version while no reload can start or swap in a new
+        one, for changes to a version's derived structures that the next version must carry
+        over (see CampusState.carry_over). The block must not look up this store's data.
+        """
+        self._current_state()
+        with self._refresh_lock, self._lock:
+            yield self._state
+
+    @property
+    def version(self) -> str:
+        """Content hash of the currently loaded campus data"""
+        return self._current_state().version
+
+    def load(self) -> Dict:
+        """Return the parsed campus data document"""
+        return self._current_state().data
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of file loads and cache hits served so far"""
+        return {'loads': self.load_count, 'hits': self.hit_count}
+
+    def get_coordinates_map(self) -> Dict[str, List[float]]:
+        return self._current_state().coordinates_map
+
+    def get_coordinate_store(self) -> CoordinateStore:
+        return self._current_state().coordinate_store
+
+    def get_location_by_id(self, location_id: str) -> Optional[Dict]:
+        return self._current_state().get_location_by_id(location_id)
+
+    def get_location_by_name(self, location_name: str) -> Optional[Dict]:
+        return self._current_state().get_location_by_name(location_name)
+
+    def get_all_locations(self) -> List[str]:
+        return self._current_state().get_all_locations()
+
+    def location_exists(self, location_name: str) -> bool:
+        return self._current_state().location_exists(location_name)
+
+    def get_locations_by_category(self, category: str) -> List[Dict]:
+        return self._current_state().get_locations_by_category(category)
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the loaded data version, 0 if nothing is loaded"""
+        state = self._state
+        return 0 if state is None else state.memory_usage()
+
+
+class CampusDataWatcher:
+    """Background thread that polls the campus data file and refreshes its store"""
+
+    def __init__(self, store: CampusDataStore, interval: float = 2.0):
+        self.store = store
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='campus-data-watcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        last_error = None
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.store.refresh()
+                last_error = None
+            except Exception as e:
+                # Most likely the file is being written; keep serving the old version and retry
+                if str(e) != last_error:
+                    print(f"Could not reload campus data from {self.store.path}: {e}")
+                last_error = str(e)
+
+
+_default_store = CampusDataStore()
+
+# A campus handle is either a store (always its latest version) or a pinned CampusState
+Campus = Union[CampusDataStore, CampusState, None]
+
+
+def get_store() -> CampusDataStore:
+    """Get the process-wide campus data store"""
+    return _default_store
+
+
+def resolve_state(campus: Campus = None) -> CampusState:
+    """
+    Get the campus data version to work on
+    Args:
+        campus: A CampusDataStore (e.g. from a CampusRegistry), a CampusState, or None for the
+            default campus
+    Returns:
+        The CampusState to use
+    """
+    if campus is None:
+        return _default_store.current()
+    if isinstance(campus, CampusState):
+        return campus
+    return campus.current()
+
+
+def load_campus_data(campus: Campus = None):
+    """Load campus data from JSON file (cached, shared between callers)"""
+    return resolve_state(campus).data
+
+
+def get_coordinates_map(campus: Campus = None) -> Dict[str, List[float]]:
     """
     Get a dictionary mapping location names to coordinates
     Returns: dict with location names as keys and [x, y, z] coordinates as values
     """
-    data = load_campus_data()
-    coordinates_map = {}
-    
-    for location_id, location_info in data['locations'].items():
-        coordinates_map[location_info['name']] = location_info['coordinates']
-    
-    return coordinates_map
+    return resolve_state(campus).coordinates_map
+
+
+def get_coordinate_store(campus: Campus = None) -> CoordinateStore:
+    """
+    Get the columnar coordinate store for the current campus data
+    Returns: CoordinateStore with a read-only (N, 3) float32 array, the names and a name -> row index
+    """
+    return resolve_state(campus).coordinate_store
 
 
-def get_location_by_id(location_id: str) -> Optional[Dict]:
+def get_location_by_id(location_id: str, campus: Campus = None) -> Optional[Dict]:
     """
     Get location details by its ID
     Args:
         location_id: The ID of the location
+        campus: Campus handle, defaults to the default campus
     Returns:
         Dictionary with location details or None if not found
     """
-    data = load_campus_data()
-    return data['locations'].get(location_id)
+    return resolve_state(campus).get_location_by_id(location_id)
 
 
-def get_location_by_name(location_name: str) -> Optional[Dict]:
+def get_location_by_name(location_name: str, campus: Campus = None) -> Optional[Dict]:
     """
-    Get location details by its name
+    Get location details by its name or one of its aliases
     Args:
-        location_name: The name of the location
+        location_name: The name of the location (case-insensitive)
+        campus: Campus handle, defaults to the default campus
     Returns:
         Dictionary with location details or None if not found
     """
-    data = load_campus_data()
-    
-    for location_id, location_info in data['locations'].items():
-        if location_info['name'].lower() == location_name.lower():
-            return location_info
-    
-    return None
+    return resolve_state(campus).get_location_by_name(location_name)
 
 
-def get_all_locations() -> List[str]:
+def get_all_locations(campus: Campus = None) -> List[str]:
     """
     Get all location names
     Returns:
         List of all location names
     """
-    data = load_campus_data()
-    return [location_info['name'] for location_info in data['locations'].values()]
+    return resolve_state(campus).get_all_locations()
 
 
-def location_exists(location_name: str) -> bool:
+def location_exists(location_name: str, campus: Campus = None) -> bool:
     """
     Check if a location name exists
     Args:
         location_name: The name to check
+        campus: Campus handle, defaults to the default campus
     Returns:
         True if location exists, False otherwise
     """
-    return get_location_by_name(location_name) is not None
+    return resolve_state(campus).location_exists(location_name)
 
 
-def get_locations_by_category(category: str) -> List[Dict]:
+def get_locations_by_category(category: str, campus: Campus = None) -> List[Dict]:
     """
     Get all locations that belong to a specific category
     Args:
         category: The category to filter by
+        campus: Campus handle, defaults to the default campus
     Returns:
         List of location dictionaries that match the category
     """
-    data = load_campus_data()
-    matching_locations = []
-    
-    for location_id, location_info in data['locations'].items():
-        if location_info['category'].lower() == category.lower():
-            matching_locations.append({
-                'id': location_id,
-                'name': location_info['name'],
-                'category': location_info['category'],
-                'coordinates': location_info['coordinates']
-            })
-    
-    return matching_locations
\ No newline at end of file
+    return resolve_state(campus).get_locations_by_category(category)
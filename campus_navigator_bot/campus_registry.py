@@ -0,0 +1,167 @@
+"""
+Registry of the campuses served by one process
+
+Each campus is a CampusDataStore, which also works as the campus handle accepted by the
+campus_data, navigation and search functions. A campus is loaded on its first request; the
+graph, search index and other derived structures are built lazily on top of it. When the
+loaded campuses exceed the memory budget, the least recently used ones are dropped and simply
+loaded again the next time they are requested. As the derived structures keep growing after a
+campus was loaded, the budget is checked again on later requests, at most once every
+BUDGET_CHECK_INTERVAL seconds.
+"""
+
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from campus_data import DATA_FILE, CampusDataStore, get_store
+
+DEFAULT_CAMPUS_ID = 'default'
+CAMPUSES_DIR = os.path.join(os.path.dirname(DATA_FILE), 'campuses')
+DEFAULT_MEMORY_BUDGET = int(os.environ.get('CAMPUS_MEMORY_BUDGET_MB', '512')) * 2 ** 20
+
+# Seconds between budget checks on requests for campuses that are already loaded
+BUDGET_CHECK_INTERVAL = 1.0
+
+
+class CampusRegistry:
+    """
+    Lazily loaded campuses keyed by campus id, evicted least recently used first
+    """
+
+    def __init__(self, campuses: Optional[Dict[str, str]] = None, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        """
+        Args:
+            campuses: Mapping of campus id to campus data JSON file
+            memory_budget: Approximate number of bytes the loaded campuses may use together
+        """
+        self.memory_budget = memory_budget
+        self.evictions = 0
+        self._budget_checked = 0.0
+        self._paths = dict(campuses or {})
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory: str = CAMPUSES_DIR, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                       include_default: bool = True) -> 'CampusRegistry':
+        """
+        Create a registry with one campus per JSON file in a directory (campus id = file name)
+        Args:
+            directory: Directory with <campus id>.json files; it does not need to exist
+            memory_budget: Approximate number of bytes the loaded campuses may use together
+            include_default: Also register data/campus_data.json as the 'default' campus
+        """
+        campuses = {}
+        if include_default:
+            campuses[DEFAULT_CAMPUS_ID] = DATA_FILE
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            campuses[os.path.splitext(os.path.basename(path))[0]] = path
+        return cls(campuses, memory_budget)
+
+    def register(self, campus_id: str, path: str):
+        """Add a campus, or point an existing campus at another file"""
+        with self._lock:
+            self._paths[campus_id] = path
+            store = self._loaded.pop(campus_id, None)
+        if store is not None:
+            store.stop_watching()
+
+    def campus_ids(self) -> List[str]:
+        return list(self._paths)
+
+    def loaded_campus_ids(self) -> List[str]:
+        """Currently loaded campuses, least recently used first"""
+        return list(self._loaded)
+
+    def get(self, campus_id: str) -> CampusDataStore:
+        """
+        Get the handle of a campus, loading it if needed
+        Args:
+            campus_id: Registered campus id
+        Returns:
+            CampusDataStore for the campus
+        Raises:
+            KeyError if the campus id is not registered
+        """
+        with self._lock:
+            store = self._loaded.get(campus_id)
+            if store is not None:
+                self._loaded.move_to_end(campus_id)
+                check_budget = time.monotonic() - self._budget_checked >= BUDGET_CHECK_INTERVAL
+        if store is not None:
+            # Graphs, route tables and caches are built after the first request, so loaded
+            # campuses grow; check them again now and then
+            if check_budget:
+                self.enforce_budget(keep=campus_id)
+            return store
+
+        with self._lock:
+            if campus_id not in self._paths:
+                raise KeyError(f"Unknown campus '{campus_id}'")
+            # Another thread may have loaded the campus since
+            store = self._loaded.get(campus_id)
+            if store is None:
+                path = self._paths[campus_id]
+                if os.path.abspath(path) == os.path.abspath(get_store().path):
+                    # Share the process-wide store instead of loading the same file twice
+                    store = get_store()
+                else:
+                    store = CampusDataStore(path)
+                self._loaded[campus_id] = store
+
+        # Load outside the registry lock so that other campuses keep being served meanwhile
+        store.current()
+        self.enforce_budget(keep=campus_id)
+        return store
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by all loaded campuses"""
+        return sum(store.memory_usage() for store in list(self._loaded.values()))
+
+    def enforce_budget(self, keep: Optional[str] = None):
+        """
+        Evict least recently used campuses until the loaded ones fit the memory budget
+        Args:
+            keep: Campus id that must stay loaded, usually the one just requested
+        """
+        evicted = []
+        with self._lock:
+            self._budget_checked = time.monotonic()
+            usage = {campus_id: store.memory_usage() for campus_id, store in self._loaded.items()}
+            total = sum(usage.values())
+            for campus_id in list(self._loaded):
+                if total <= self.memory_budget:
+                    break
+                if campus_id == keep or self._loaded[campus_id] is get_store():
+                    # The process-wide store stays resident no matter what
+                    continue
+                evicted.append(self._loaded.pop(campus_id))
+                total -= usage[campus_id]
+                self.evictions += 1
+        for store in evicted:
+            store.stop_watching()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'registered': len(self._paths),
+            'loaded': len(self._loaded),
+            'evictions': self.evictions,
+            'memory_usage': self.memory_usage(),
+        }
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry() -> CampusRegistry:
+    """Get the process-wide registry: the default campus plus every file in data/campuses/"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = CampusRegistry.from_directory()
+        return _default_registry
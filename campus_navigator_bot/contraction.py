@@ -0,0 +1,375 @@
+"""
+Contraction Hierarchies for fast routing on very large campuses
+
+Preprocessing ranks the locations and removes ("contracts") them one at a time from least to
+most important. Whenever removing a location would lengthen the shortest route between two of
+its neighbors, a shortcut edge between them is added that stands for the two edges through it.
+A query then runs Dijkstra from both ends that only ever moves to higher ranked locations; the
+two searches meet at the most important location of the route after settling a few hundred
+locations where Dijkstra settles thousands. The shortcuts of the route are finally unpacked
+into the original locations, so the result is the same route Dijkstra finds.
+
+Building a hierarchy takes minutes for large campuses, so it is done offline and saved next to
+the campus data:
+
+Usage:
+    python contraction.py [data/campus_data.json]
+"""
+
+import argparse
+import heapq
+import os
+import time
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from campus_data import DATA_FILE
+
+HIERARCHY_DIR = os.path.join(os.path.dirname(DATA_FILE), 'route_tables')
+FORMAT_VERSION = 1
+
+# Witness searches give up after settling this many locations. A witness that is not found
+# only costs an unnecessary shortcut, never a wrong route.
+WITNESS_SETTLE_LIMIT = 30
+
+
+class ContractionHierarchy:
+    """
+    Upward graph of a contracted CampusGraph
+
+    The edges of node v lead to the neighbors ranked above it, in CSR form (up_indptr,
+    up_indices, up_weights). up_middle holds the contracted node a shortcut bypasses, or -1
+    for an edge of the original graph.
+    """
+
+    def __init__(self, rank: np.ndarray, up_indptr: np.ndarray, up_indices: np.ndarray,
+                 up_weights: np.ndarray, up_middle: np.ndarray):
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        for array in (self.rank, self.up_indptr, self.up_indices, self.up_weights, self.up_middle):
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    @cached_property
+    def offsets(self) -> List[int]:
+        """up_indptr as a plain list, which is faster to index in the query loop"""
+        return self.up_indptr.tolist()
+
+    @property
+    def shortcut_count(self) -> int:
+        return int(np.count_nonzero(self.up_middle >= 0))
+
+    @classmethod
+    def build(cls, graph) -> 'ContractionHierarchy':
+        """
+        Contract a graph
+        Args:
+            graph: navigation.CampusGraph
+        """
+        return _Contractor(graph.indptr, graph.indices, graph.weights).run()
+
+    @classmethod
+    def load(cls, path: str, count: int) -> Optional['ContractionHierarchy']:
+        """
+        Load a hierarchy saved with save()
+        Args:
+            path: Hierarchy file
+            count: Number of nodes the hierarchy must have
+        Returns:
+            The hierarchy, or None if the file is missing, unreadable or of another graph
+        """
+        try:
+            with np.load(path) as data:
+                if int(data['format']) != FORMAT_VERSION or len(data['rank']) != count:
+                    return None
+                return cls(data['rank'], data['up_indptr'], data['up_indices'], data['up_weights'],
+                           data['up_middle'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: str):
+        """Write the hierarchy to a file, replaced atomically"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, format=FORMAT_VERSION, rank=self.rank, up_indptr=self.up_indptr,
+                     up_indices=self.up_indices, up_weights=self.up_weights, up_middle=self.up_middle)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load_or_build(cls, graph, key: str, directory: str = HIERARCHY_DIR) -> 'ContractionHierarchy':
+        """
+        Load the hierarchy of a graph from disk, or build it and save it for the next process
+        Args:
+            graph: navigation.CampusGraph
+            key: Identifies the graph: its data version and construction settings
+            directory: Where hierarchies are kept
+        """
+        path = hierarchy_path(key, directory)
+        hierarchy = cls.load(path, graph.get_vertex_count())
+        if hierarchy is None:
+            hierarchy = cls.build(graph)
+            try:
+                hierarchy.save(path)
+            except OSError as e:
+                print(f"Could not save contraction hierarchy {path}: {e}")
+        return hierarchy
+
+    def path(self, source: int, target: int,
+             stats: Optional[Dict[str, int]] = None) -> Optional[List[int]]:
+        """
+        Shortest route between two nodes
+        Args:
+            source: Start node id
+            target: Destination node id
+            stats: Optional dict that receives the 'expanded' and 'queued' node counts
+        Returns:
+            Path as a list of node ids of the original graph, or None if there is no route
+        """
+        indptr = self.offsets
+        indices, weights = self.up_indices, self.up_weights
+        # Both searches only reach a small part of the graph, so they keep their state in dicts
+        distances = ({source: 0.0}, {target: 0.0})
+        previous = ({source: -1}, {target: -1})
+        settled = (set(), set())
+        queues = ([(0.0, source)], [(0.0, target)])
+        best, meeting = float('inf'), -1
+        expanded = 0
+
+        infinity = float('inf')
+        while True:
+            # A side is finished once nothing it has queued can lead to a shorter route
+            forward_top = queues[0][0][0] if queues[0] else infinity
+            backward_top = queues[1][0][0] if queues[1] else infinity
+            if min(forward_top, backward_top) >= best:
+                break
+            side = 0 if forward_top <= backward_top else 1
+            distance, current = heapq.heappop(queues[side])
+            own_settled = settled[side]
+            if current in own_settled:
+                continue
+            own_settled.add(current)
+            expanded += 1
+
+            other_distance = distances[1 - side].get(current)
+            if other_distance is not None and distance + other_distance < best:
+                best, meeting = distance + other_distance, current
+
+            own_distances, own_previous = distances[side], previous[side]
+            first, last = indptr[current], indptr[current + 1]
+            edges = list(zip(indices[first:last].tolist(), weights[first:last].tolist()))
+            # Stall on demand: if a higher ranked node already offers a shorter way here, the
+            # search reached this node on a detour and nothing beyond it can be on the route
+            if any(own_distances.get(neighbor, infinity) + weight < distance for neighbor, weight in edges):
+                continue
+            for neighbor, weight in edges:
+                new_distance = distance + weight
+                if new_distance < own_distances.get(neighbor, infinity):
+                    own_distances[neighbor] = new_distance
+                    own_previous[neighbor] = current
+                    heapq.heappush(queues[side], (new_distance, neighbor))
+
+        if stats is not None:
+            stats['expanded'] = stats.get('expanded', 0) + expanded
+            stats['queued'] = stats.get('queued', 0) + len(distances[0]) + len(distances[1])
+        if meeting < 0:
+            return None
+
+        # Up the forward search tree from the source to the meeting node, then down to the target
+        chain = [meeting]
+        while previous[0][chain[-1]] >= 0:
+            chain.append(previous[0][chain[-1]])
+        chain.reverse()
+        while previous[1][chain[-1]] >= 0:
+            chain.append(previous[1][chain[-1]])
+
+        path = [chain[0]]
+        for a, b in zip(chain, chain[1:]):
+            path.extend(self._unpack(a, b))
+        return path
+
+    def _edge_middle(self, a: int, b: int) -> int:
+        """Node bypassed by the edge between a and b, -1 for an original edge"""
+        low, high = (a, b) if self.rank[a] < self.rank[b] else (b, a)
+        first, last = self.offsets[low], self.offsets[low + 1]
+        position = self.up_indices[first:last].tolist().index(high)
+        return int(self.up_middle[first + position])
+
+    def _unpack(self, a: int, b: int) -> List[int]:
+        """Original nodes along the edge from a to b, without a itself"""
+        nodes = []
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._edge_middle(a, b)
+            if middle < 0:
+                nodes.append(b)
+            else:
+                # The first half has to come out first, so it is pushed last
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return nodes
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the hierarchy"""
+        usage = sum(array.nbytes for array in (
+            self.rank, self.up_indptr, self.up_indices, self.up_weights, self.up_middle))
+        if 'offsets' in self.__dict__:
+            usage += 36 * len(self.offsets)
+        return usage
+
+
+def hierarchy_path(key: str, directory: str = HIERARCHY_DIR) -> str:
+    return os.path.join(directory, f"{key}.ch.npz")
+
+
+class _Contractor:
+    """
+    Contracts the nodes of a graph in order of importance
+
+    The importance of a node is twice its edge difference (shortcuts its removal needs minus
+    the edges it removes) plus the number of its neighbors contracted before it and its level
+    (one more than the highest level among them), which spread contraction evenly over the
+    campus and keep the hierarchy shallow. Priorities go stale as neighbors are contracted, so a
+    node's priority is recomputed when it comes up and the node is queued again if it is no
+    longer the least important one.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray):
+        self.count = len(indptr) - 1
+        bounds = indptr.tolist()
+        neighbors, distances = indices.tolist(), weights.tolist()
+        # Remaining graph: node -> {neighbor: (distance, bypassed node or -1)}
+        self.adjacency = [
+            {neighbors[i]: (distances[i], -1) for i in range(bounds[node], bounds[node + 1])}
+            for node in range(self.count)
+        ]
+        self.contracted_neighbors = [0] * self.count
+        # One more than the highest level among the contracted neighbors
+        self.levels = [0] * self.count
+
+    def _missing_shortcuts(self, source: int, excluded: int, targets: Dict[int, float]) -> List[int]:
+        """
+        Targets that the remaining graph without one node cannot reach from a node within their
+        given distance, found with a bounded Dijkstra search
+        """
+        adjacency = self.adjacency
+        targets = dict(targets)
+        limit = max(targets.values())
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        settled = 0
+        while queue:
+            distance, current = heapq.heappop(queue)
+            if distance > distances[current]:
+                continue
+            if distance > limit or settled >= WITNESS_SETTLE_LIMIT:
+                break
+            settled += 1
+            for neighbor, (weight, _) in adjacency[current].items():
+                if neighbor == excluded:
+                    continue
+                new_distance = distance + weight
+                if new_distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = new_distance
+                    heapq.heappush(queue, (new_distance, neighbor))
+                    if neighbor in targets and new_distance <= targets[neighbor]:
+                        # A witness: a route at most as long as the one through the excluded node
+                        del targets[neighbor]
+                        if not targets:
+                            return []
+                        limit = max(targets.values())
+        return list(targets)
+
+    def _shortcuts(self, node: int) -> List[Tuple[int, int, float]]:
+        """Shortcuts needed between the neighbors of a node if it were removed"""
+        neighbors = list(self.adjacency[node].items())
+        shortcuts = []
+        for i, (first, (first_weight, _)) in enumerate(neighbors[:-1]):
+            first_edges = self.adjacency[first]
+            targets = {}
+            for second, (second_weight, _) in neighbors[i + 1:]:
+                # Neighbors of a location are mostly close enough to be connected directly, which
+                # is always the shorter way, so most pairs need no search
+                via = first_weight + second_weight
+                if first_edges.get(second, (float('inf'),))[0] > via:
+                    targets[second] = via
+            if targets:
+                for second in self._missing_shortcuts(first, node, targets):
+                    shortcuts.append((first, second, targets[second]))
+        return shortcuts
+
+    def _priority(self, node: int, shortcuts: List) -> int:
+        return (2 * (len(shortcuts) - len(self.adjacency[node])) + self.contracted_neighbors[node]
+                + self.levels[node])
+
+    def run(self) -> ContractionHierarchy:
+        queue = [(self._priority(node, self._shortcuts(node)), node) for node in range(self.count)]
+        heapq.heapify(queue)
+        rank = np.empty(self.count, dtype=np.int32)
+        upward = [None] * self.count
+        contracted = bytearray(self.count)
+
+        level = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if contracted[node]:
+                continue
+            shortcuts = self._shortcuts(node)
+            priority = self._priority(node, shortcuts)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))
+                continue
+
+            # The neighbors still in the graph are all ranked above this node
+            rank[node] = level
+            level += 1
+            contracted[node] = 1
+            upward[node] = self.adjacency[node]
+            for neighbor in upward[node]:
+                del self.adjacency[neighbor][node]
+                self.contracted_neighbors[neighbor] += 1
+                self.levels[neighbor] = max(self.levels[neighbor], self.levels[node] + 1)
+            for first, second, distance in shortcuts:
+                if distance < self.adjacency[first].get(second, (float('inf'),))[0]:
+                    self.adjacency[first][second] = (distance, node)
+                    self.adjacency[second][first] = (distance, node)
+            self.adjacency[node] = {}
+
+        counts = [len(edges) for edges in upward]
+        up_indptr = np.zeros(self.count + 1, dtype=np.int32)
+        np.cumsum(counts, out=up_indptr[1:])
+        up_indices = np.fromiter((n for edges in upward for n in edges), dtype=np.int32, count=up_indptr[-1])
+        up_weights = np.fromiter((e[0] for edges in upward for e in edges.values()), dtype=np.float64,
+                                 count=up_indptr[-1])
+        up_middle = np.fromiter((e[1] for edges in upward for e in edges.values()), dtype=np.int32,
+                                count=up_indptr[-1])
+        return ContractionHierarchy(rank, up_indptr, up_indices, up_weights, up_middle)
+
+
+def main():
+    from campus_data import CampusDataStore
+    from navigation import CampusGraph
+
+    parser = argparse.ArgumentParser(description="Build the contraction hierarchy of a campus")
+    parser.add_argument('path', nargs='?', default=DATA_FILE, help="campus data JSON file")
+    args = parser.parse_args()
+
+    graph = CampusGraph(CampusDataStore(args.path).current())
+    started = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(graph)
+    path = hierarchy_path(graph.file_key)
+    hierarchy.save(path)
+    print(f"Contracted {len(hierarchy)} locations in {time.perf_counter() - started:.1f} s, "
+          f"{hierarchy.shortcut_count} shortcuts, written to {path}")
+
+
+if __name__ == "__main__":
+    main()
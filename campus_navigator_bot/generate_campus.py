@@ -0,0 +1,155 @@
+"""
+Synthetic campus generator for scale and performance testing
+
+Writes campus data files in the same schema as data/campus_data.json. The output only depends
+on the options and the seed, so benchmark runs can be repeated exactly.
+
+Usage:
+    python generate_campus.py 100000 --floors 4 --seed 7 -o /tmp/campus_100k.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+from typing import Dict, Iterator, Tuple
+
+CATEGORIES = [
+    'Academic Buildings',
+    'Administration Building',
+    'Mixed-Used',
+    'Auxiliary Services',
+    'Allied Service',
+    'Research Office',
+    'Others',
+]
+
+BUILDING_NAMES = [
+    'Ibaan', 'Taal', 'Rosario', 'Apacible', 'Sto. Tomas', 'Joson', 'Ermita', 'Villadolid', 'Lobo',
+    'Lipa', 'Balayan', 'Calatagan', 'Lemery', 'Nasugbu', 'Tuy', 'Lian', 'Mabini', 'Bauan',
+    'Malvar', 'Padre Garcia', 'Cuenca', 'Alitagtag', 'Agoncillo', 'Laurel', 'Tanauan', 'Tingloy',
+]
+
+# Side of the square area that counts as one building when naming locations
+BUILDING_SIZE = 40.0
+
+
+def _building_name(column: int, row: int) -> str:
+    index = abs(column) * 7919 + abs(row) * 104729
+    name = BUILDING_NAMES[index % len(BUILDING_NAMES)]
+    return f"{name} Building {column}-{row}"
+
+
+def generate_locations(count: int, seed: int = 0, floors: int = 1, floor_height: float = 3.0,
+                       spacing: float = 10.0, layout: str = 'uniform', category_skew: float = 1.0,
+                       name_style: str = 'campus') -> Iterator[Tuple[str, Dict]]:
+    """
+    Generate synthetic campus locations
+    Args:
+        count: Number of locations
+        seed: Random seed; the same options and seed always give the same campus
+        floors: Number of floors; floor f is at z = f * floor_height
+        floor_height: Vertical distance between floors
+        spacing: Average horizontal distance between neighboring locations. With the default
+            20 unit connection radius, 10 gives about a dozen neighbors per location.
+        layout: 'uniform' spreads locations evenly, 'clustered' groups them around building centers
+        category_skew: Zipf exponent of the category distribution (0 = uniform)
+        name_style: 'campus' for building/room names, 'numbered' for "Location <n>"
+    Yields:
+        (location_id, location_info) tuples in the campus_data.json schema
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    if layout not in ('uniform', 'clustered'):
+        raise ValueError(f"Unknown layout '{layout}'")
+    if name_style not in ('campus', 'numbered'):
+        raise ValueError(f"Unknown name style '{name_style}'")
+
+    rng = random.Random(seed)
+    side = spacing * math.sqrt(count)
+    category_weights = [1 / (rank + 1) ** category_skew for rank in range(len(CATEGORIES))]
+
+    if layout == 'clustered':
+        # Roughly 50 locations per building, spread around its center
+        building_count = max(1, count // 50)
+        centers = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(building_count)]
+        cluster_radius = spacing * math.sqrt(50) / 2
+
+    rooms_per_floor = {}
+    for i in range(1, count + 1):
+        if layout == 'uniform':
+            x = rng.uniform(0, side)
+            y = rng.uniform(0, side)
+        else:
+            center_x, center_y = rng.choice(centers)
+            x = rng.gauss(center_x, cluster_radius)
+            y = rng.gauss(center_y, cluster_radius)
+        floor = rng.randrange(floors)
+        category = rng.choices(CATEGORIES, weights=category_weights)[0]
+
+        if name_style == 'numbered':
+            name = f"Location {i}"
+        else:
+            # Rooms are numbered per building and floor, which keeps every name unique; the
+            # dash keeps floor 1 room 101 ("1-101") apart from floor 11 room 1 ("11-01")
+            building = (math.floor(x / BUILDING_SIZE), math.floor(y / BUILDING_SIZE))
+            room = rooms_per_floor.get((building, floor), 0) + 1
+            rooms_per_floor[(building, floor)] = room
+            name = f"{_building_name(*building)} Room {floor + 1}-{room:02d}"
+
+        yield str(i), {
+            'name': name,
+            'category': category,
+            'coordinates': [round(x, 2), round(y, 2), round(floor * floor_height, 2)]
+        }
+
+
+def write_campus(path: str, count: int, campus_name: str = 'Synthetic Campus', **options) -> str:
+    """
+    Write a synthetic campus data file
+    Args:
+        path: Output JSON file
+        count: Number of locations
+        campus_name: Value of the campus_name field
+        **options: Passed on to generate_locations
+    Returns:
+        The output path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written one location at a time so that million-location files need little memory
+    with open(path, 'w') as f:
+        f.write('{\n')
+        f.write(f'  "campus_name": {json.dumps(campus_name)},\n')
+        f.write(f'  "generator": {json.dumps(dict(options, count=count))},\n')
+        f.write('  "locations": {')
+        for n, (location_id, location_info) in enumerate(generate_locations(count, **options)):
+            f.write(',' if n else '')
+            f.write(f'\n    {json.dumps(location_id)}: {json.dumps(location_info)}')
+        f.write('\n  }\n}\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic campus_data.json")
+    parser.add_argument('count', type=int, help="number of locations (e.g. 10 to 1000000)")
+    parser.add_argument('--output', '-o', default='synthetic_campus.json', help="output JSON file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--floors', type=int, default=1)
+    parser.add_argument('--floor-height', type=float, default=3.0)
+    parser.add_argument('--spacing', type=float, default=10.0)
+    parser.add_argument('--layout', choices=['uniform', 'clustered'], default='uniform')
+    parser.add_argument('--category-skew', type=float, default=1.0)
+    parser.add_argument('--name-style', choices=['campus', 'numbered'], default='campus')
+    args = parser.parse_args()
+
+    write_campus(
+        args.output, args.count, seed=args.seed, floors=args.floors, floor_height=args.floor_height,
+        spacing=args.spacing, layout=args.layout, category_skew=args.category_skew,
+        name_style=args.name_style
+    )
+    print(f"Wrote {args.count} locations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
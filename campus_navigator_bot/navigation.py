@@ -2,132 +2,1131 @@
 Navigation module with pathfinding algorithms for campus navigation
 """
 
+import heapq
 import math
-from typing import List, Dict, Tuple, Optional
-from campus_data import get_location_by_name, get_all_locations, get_coordinates_map
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import cached_property
+from types import MappingProxyType
+from typing import Callable, Iterator, List, Dict, Mapping, NamedTuple, Sequence, Set, Tuple, Optional, Union
+import numpy as np
+from campus_data import (
+    Campus, CampusDiff, CampusState, get_all_locations, get_store, normalize_key, register_derived,
+    resolve_state
+)
+from all_pairs import AllPairsTable
+from contraction import ContractionHierarchy, hierarchy_path
+from route_cache import RouteCache
+from spatial import SpatialGrid
+from tour import TOUR_TIME_BUDGET, plan_order
+
+# Locations closer than this are connected by an edge
+CONNECTION_RADIUS = 20
+
+# How the shared campus graph connects locations:
+#   'radius' - only locations within CONNECTION_RADIUS of each other
+#   'knn'    - additionally every location to its NEAREST_NEIGHBORS nearest locations, and any
+#              islands still left to the closest location outside them, so every route exists
+GRAPH_CONNECTIVITY = 'radius'
+NEAREST_NEIGHBORS = 4
+
+# Campuses with up to this many locations answer routes from a precomputed all-pairs table
+# (see all_pairs.py); it takes 8 bytes per pair of locations, 32 MB at the limit
+ALL_PAIRS_MAX_LOCATIONS = 2000
+
+# Keeps the A* heuristic admissible for the float32 edge weights, whose rounding error is about 6e-8
+HEURISTIC_SCALE = 1 - 1e-6
+
+
+class GraphOverrides:
+    """
+    Runtime changes to the campus graph, by location name: closed or slowed down locations and
+    connections (construction, events)
+    
+    A factor multiplies the cost of walking an edge: a location's factor applies to all of its
+    edges, and inf closes the location or connection. Factors are at least 1, so the straight-line
+    A* heuristic stays admissible and a route that avoids every changed element stays the
+    shortest. They change which routes the searches prefer; reported distances remain the walked
+    length. Instances are immutable, changes produce a new one (see set_edge_factor).
+    """
+    
+    def __init__(self, location_factors: Optional[Mapping[str, float]] = None,
+                 edge_factors: Optional[Mapping[Tuple[str, str], float]] = None):
+        self.location_factors = MappingProxyType(dict(location_factors or {}))
+        self.edge_factors = MappingProxyType(dict(edge_factors or {}))
+    
+    def __bool__(self) -> bool:
+        return bool(self.location_factors or self.edge_factors)
+    
+    def __repr__(self) -> str:
+        return f"GraphOverrides(locations={dict(self.location_factors)}, edges={dict(self.edge_factors)})"
+    
+    @staticmethod
+    def edge_key(start: str, end: str) -> Tuple[str, str]:
+        """Edges are undirected, so both directions share one key"""
+        return (start, end) if start <= end else (end, start)
+    
+    def location_factor(self, name: str) -> float:
+        return self.location_factors.get(name, 1.0)
+    
+    def edge_factor(self, start: str, end: str) -> float:
+        return self.edge_factors.get(self.edge_key(start, end), 1.0)
+    
+    def with_location_factor(self, name: str, factor: float) -> 'GraphOverrides':
+        location_factors = dict(self.location_factors)
+        location_factors[name] = factor
+        if factor == 1:
+            del location_factors[name]
+        return GraphOverrides(location_factors, self.edge_factors)
+    
+    def with_edge_factor(self, start: str, end: str, factor: float) -> 'GraphOverrides':
+        edge_factors = dict(self.edge_factors)
+        edge_factors[self.edge_key(start, end)] = factor
+        if factor == 1:
+            del edge_factors[self.edge_key(start, end)]
+        return GraphOverrides(self.location_factors, edge_factors)
 
 
 class CampusGraph:
     """
     A graph representation of the campus with locations as nodes and connections as edges
+    
+    Edges are stored in compressed sparse row (CSR) form over integer node ids: the neighbors of
+    node i are indices[indptr[i]:indptr[i + 1]], with their distances at the same positions in
+    weights. Node ids are positions in `names`; location names are translated to ids (`ids`) and
+    back only at the API boundary, so the searches never hash a string.
+    
+    A graph is frozen once built: its attributes cannot be reassigned and its arrays and
+    mappings are read-only. One graph per campus data version is shared by every thread and
+    Streamlit session (see get_campus_graph), so nothing may change it in place. Data changes
+    produce a new graph instead (with_changes), and so do runtime closures (with_overrides).
     """
     
-    def __init__(self):
-        self.vertices = {}
-        self.edges = {}
+    _frozen = False
+    # Set on graphs derived with with_overrides: the graph without overrides and the node ids
+    # and (smaller id, larger id) edges whose weights the overrides changed
+    base = None
+    overrides = GraphOverrides()
+    affected_nodes = frozenset()
+    affected_edges = frozenset()
+    
+    def __init__(self, state: Optional[CampusState] = None, connectivity: Optional[str] = None,
+                 k: int = NEAREST_NEIGHBORS):
+        """
+        Args:
+            state: Campus data version, defaults to the current one
+            connectivity: 'radius' or 'knn', defaults to GRAPH_CONNECTIVITY
+            k: Number of nearest neighbors every location is connected to in 'knn' mode
+        """
+        self.state = state or get_store().current()
+        self.connectivity = connectivity or GRAPH_CONNECTIVITY
+        if self.connectivity not in ('radius', 'knn'):
+            raise ValueError(f"Unknown graph connectivity '{self.connectivity}'")
+        self.k = k
+        self.build_stats = {}
         self._initialize_graph()
+        self._freeze()
+    
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"CampusGraph is frozen, cannot set '{name}'")
+        super().__setattr__(name, value)
+    
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(f"CampusGraph is frozen, cannot delete '{name}'")
+        super().__delattr__(name)
+    
+    def _freeze(self):
+        """Make the mappings and arrays read-only and forbid further attribute changes"""
+        self.vertices = MappingProxyType(self.vertices)
+        self.ids = MappingProxyType(self.ids)
+        for array in (self.indptr, self.indices, self.weights, self.rows):
+            array.flags.writeable = False
+        self.build_stats = MappingProxyType(self.build_stats)
+        self._frozen = True
+    
+    def _set_vertices(self, coordinate_store):
+        """Number the locations of a coordinate store; duplicated names keep their first row"""
+        self.coordinates = coordinate_store
+        # Name -> row in the coordinate store
+        self.vertices = coordinate_store.index
+        self.names = tuple(self.vertices)
+        if len(self.names) == len(coordinate_store):
+            # No duplicated names, so node ids and coordinate store rows are the same
+            self.ids = self.vertices
+            self.rows = np.arange(len(self.names))
+        else:
+            self.ids = dict(zip(self.names, range(len(self.names))))
+            self.rows = np.fromiter(self.vertices.values(), dtype=np.int64, count=len(self.names))
     
     def _initialize_graph(self):
         """Initialize the graph with campus locations as vertices"""
-        coordinates_map = get_coordinates_map()
-        
-        # Add all locations as vertices
-        for location_name in coordinates_map.keys():
-            self.vertices[location_name] = coordinates_map[location_name]
-            self.edges[location_name] = []
-        
-        # Create connections between nearby locations
-        # For now, connect locations that are within a certain distance
-        locations = list(coordinates_map.keys())
-        for i in range(len(locations)):
-            for j in range(i + 1, len(locations)):
-                loc1 = locations[i]
-                loc2 = locations[j]
-                
-                # Calculate Euclidean distance
-                coord1 = coordinates_map[loc1]
-                coord2 = coordinates_map[loc2]
-                distance = math.sqrt((coord1[0] - coord2[0])**2 + 
-                                   (coord1[1] - coord2[1])**2 + 
-                                   (coord1[2] - coord2[2])**2)
-                
-                # Connect if locations are reasonably close (adjust threshold as needed)
-                # Using a threshold of 20 units to connect nearby locations
-                if distance <= 20:
-                    self.edges[loc1].append((loc2, distance))
-                    self.edges[loc2].append((loc1, distance))
+        started = time.perf_counter()
+        self._set_vertices(self.state.coordinate_store)
+        coords = self.node_coordinates
+        
+        # Connect locations within the radius; the grid only compares locations in adjacent cells
+        grid = SpatialGrid(coords, CONNECTION_RADIUS)
+        first, second, distance = grid.pairs_within(CONNECTION_RADIUS)
+        radius_edges = len(first)
+        
+        if self.connectivity == 'knn':
+            point, neighbor, neighbor_distance = grid.nearest_neighbors(self.k)
+            first, second, distance = _merge_edges(
+                len(self.names), (first, second, distance), (point, neighbor, neighbor_distance))
+        knn_edges = len(first) - radius_edges
+        
+        labels = _connected_components(len(self.names), first, second)
+        components = len(np.unique(labels))
+        if self.connectivity == 'knn' and components > 1:
+            first, second, distance = _bridge_components(grid, labels, first, second, distance)
+            components = 1
+        
+        self._set_edges(first, second, distance)
+        self.build_stats = {
+            'seconds': time.perf_counter() - started,
+            'vertices': len(self.names),
+            'edges': len(first),
+            'radius_edges': radius_edges,
+            'knn_edges': knn_edges,
+            'bridge_edges': len(first) - radius_edges - knn_edges,
+            'components': components,
+        }
+    
+    def _set_edges(self, first: np.ndarray, second: np.ndarray, distance: np.ndarray):
+        """Build the CSR arrays from undirected edges given as node id pairs"""
+        source = np.concatenate([first, second])
+        target = np.concatenate([second, first])
+        weight = np.concatenate([distance, distance])
+        # Neighbors in node id order, as the pairwise construction produced them
+        order = np.lexsort((target, source))
+        self.indptr = np.searchsorted(source[order], np.arange(len(self.names) + 1)).astype(np.int32)
+        self.indices = target[order].astype(np.int32)
+        self.weights = weight[order].astype(np.float32)
+    
+    def with_changes(self, state: CampusState, diff: CampusDiff) -> 'CampusGraph':
+        """
+        Build the graph for a new version of the campus data by patching this one
+        
+        Edges between unchanged locations are carried over by renumbering their node ids; only
+        the edges of added and changed locations are searched for again. This graph, which may
+        still be serving requests, is left untouched.
+        
+        Args:
+            state: The new campus data version
+            diff: Differences between this graph's data version and the new one
+        
+        Returns:
+            A new CampusGraph for the given state
+        """
+        if self.connectivity != 'radius':
+            # Nearest neighbors and island bridges can change anywhere, so rebuild
+            return CampusGraph(state, self.connectivity, self.k)
+        
+        started = time.perf_counter()
+        graph = CampusGraph.__new__(CampusGraph)
+        graph.state = state
+        graph.connectivity = self.connectivity
+        graph.k = self.k
+        graph._set_vertices(state.coordinate_store)
+        
+        # New id of every old node, -1 for removed and changed locations and their edges
+        new_ids = np.fromiter((graph.ids.get(name, -1) for name in self.names), dtype=np.int64,
+                              count=len(self.names))
+        dropped = [self.ids[name] for name in diff.removed_names if name in self.ids]
+        new_ids[dropped] = -1
+        first = new_ids[np.repeat(np.arange(len(self.names)), np.diff(self.indptr))]
+        second = new_ids[self.indices]
+        kept = (first >= 0) & (second >= 0) & (first < second)
+        kept_edges = (first[kept], second[kept], self.weights[kept].astype(np.float64))
+        
+        # Connect added and changed locations to their neighbors in the new data
+        added = [graph.ids[name] for name in diff.added_names if name in graph.ids]
+        grid = SpatialGrid(graph.node_coordinates, CONNECTION_RADIUS)
+        new_edges = grid.neighbors_within(added, CONNECTION_RADIUS)
+        graph._set_edges(*_merge_edges(len(graph.names), kept_edges, new_edges))
+        
+        graph.build_stats = {
+            'seconds': time.perf_counter() - started,
+            'vertices': len(graph.names),
+            'edges': len(graph.indices) // 2,
+            'changed_vertices': len(diff),
+        }
+        graph._freeze()
+        return graph
+    
+    def with_overrides(self, overrides: GraphOverrides) -> 'CampusGraph':
+        """
+        Build a graph whose edge weights include runtime closures and slowdowns
+        
+        Node ids and the CSR structure are shared with this graph, only the weights are
+        recomputed; closed edges get an infinite weight, which no search ever relaxes.
+        Overrides of locations or connections that do not exist in this graph are ignored.
+        
+        Args:
+            overrides: Changes relative to this graph, which must be one without overrides
+        
+        Returns:
+            A new CampusGraph
+        """
+        graph = CampusGraph.__new__(CampusGraph)
+        for name in ('state', 'connectivity', 'k', 'coordinates', 'vertices', 'names', 'ids', 'rows',
+                     'indptr', 'indices'):
+            setattr(graph, name, getattr(self, name))
+        for name in ('node_coordinates', 'offsets', 'positions'):
+            if name in self.__dict__:
+                graph.__dict__[name] = self.__dict__[name]
+        
+        factors = np.ones(len(self.indices))
+        source = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        affected_nodes, affected_edges = set(), set()
+        for name, factor in overrides.location_factors.items():
+            node = self.ids.get(name)
+            if node is not None:
+                factors[(source == node) | (self.indices == node)] *= factor
+                affected_nodes.add(node)
+        for (start, end), factor in overrides.edge_factors.items():
+            first, second = self.ids.get(start), self.ids.get(end)
+            if first is None or second is None or self._edge_position(first, second) < 0:
+                continue
+            factors[[self._edge_position(first, second), self._edge_position(second, first)]] *= factor
+            affected_edges.add((min(first, second), max(first, second)))
+        # inf * 0 would be nan for locations that share coordinates
+        graph.weights = np.where(np.isinf(factors), np.inf, self.weights * factors).astype(np.float32)
+        
+        graph.base = self
+        graph.overrides = overrides
+        graph.affected_nodes = frozenset(affected_nodes)
+        graph.affected_edges = frozenset(affected_edges)
+        graph.build_stats = dict(self.build_stats, overridden_locations=len(affected_nodes),
+                                 overridden_edges=len(affected_edges))
+        graph._freeze()
+        return graph
+    
+    def _edge_position(self, first: int, second: int) -> int:
+        """Position of the edge first -> second in indices/weights, -1 if there is none"""
+        start, end = self.indptr[first], self.indptr[first + 1]
+        position = start + int(np.searchsorted(self.indices[start:end], second))
+        return position if position < end and self.indices[position] == second else -1
+    
+    def path_cost(self, path: Sequence[int]) -> float:
+        """Sum of the edge weights along a path of node ids: its length, scaled by any overrides"""
+        weights = self.weights
+        return sum(float(weights[self._edge_position(first, second)]) for first, second in zip(path, path[1:]))
+    
+    def is_affected(self, path: Sequence[int]) -> bool:
+        """Whether a path of node ids uses a location or connection changed by this graph's overrides"""
+        if not self.affected_nodes and not self.affected_edges:
+            return False
+        if any(node in self.affected_nodes for node in path):
+            return True
+        return any((min(first, second), max(first, second)) in self.affected_edges
+                   for first, second in zip(path, path[1:]))
+    
+    @cached_property
+    def node_coordinates(self) -> np.ndarray:
+        """(N, 3) float64 coordinates by node id"""
+        coords = self.coordinates.coords[self.rows].astype(np.float64)
+        coords.flags.writeable = False
+        return coords
+    
+    @cached_property
+    def open_nodes(self) -> Optional[np.ndarray]:
+        """
+        Boolean array over the nodes marking the locations that are not closed, or None if no
+        location is; closed locations are never offered as nearby locations or route starts
+        """
+        closed = [node for node in self.affected_nodes
+                  if np.isinf(self.overrides.location_factor(self.names[node]))]
+        if not closed:
+            return None
+        mask = np.ones(len(self.names), dtype=bool)
+        mask[closed] = False
+        mask.flags.writeable = False
+        return mask
+    
+    @cached_property
+    def offsets(self) -> List[int]:
+        """indptr as a plain list; slicing the arrays with Python ints is faster in the search loops"""
+        return self.indptr.tolist()
+    
+    @cached_property
+    def positions(self) -> List[Tuple[float, float, float]]:
+        """Coordinates by node id as plain tuples, which are much faster to read one at a time"""
+        return [tuple(point) for point in self.node_coordinates.tolist()]
+    
+    @cached_property
+    def edges(self) -> Mapping[str, Tuple[Tuple[str, float], ...]]:
+        """
+        Name-keyed view of the adjacency: location name -> ((neighbor name, distance), ...)
+        Built on first access only; the searches use the CSR arrays.
+        """
+        source = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        # Exact (float64) distances, as the edge weights are only stored in single precision
+        delta = self.node_coordinates[self.indices] - self.node_coordinates[source]
+        distances = np.sqrt(np.einsum('ij,ij->i', delta, delta)).tolist()
+        names = self.names
+        edge_list = tuple(zip([names[node] for node in self.indices.tolist()], distances))
+        bounds = self.indptr.tolist()
+        return MappingProxyType({
+            location_name: edge_list[bounds[i]:bounds[i + 1]] for i, location_name in enumerate(names)
+        })
+    
+    def neighbors(self, node: int) -> Tuple[List[int], List[float]]:
+        """Neighbor node ids of a node and the distances to them"""
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return self.indices[start:end].tolist(), self.weights[start:end].tolist()
     
     def get_neighbors(self, vertex: str) -> List[Tuple[str, float]]:
         """Get neighbors of a vertex with their distances"""
-        return self.edges.get(vertex, [])
+        node = self.ids.get(vertex)
+        if node is None:
+            return []
+        neighbors, weights = self.neighbors(node)
+        return [(self.names[neighbor], weight) for neighbor, weight in zip(neighbors, weights)]
+    
+    @property
+    def file_key(self) -> str:
+        """Identifies the graph in files derived from it: data version and construction settings"""
+        key = f"{self.state.version}-r{CONNECTION_RADIUS:g}-{self.connectivity}"
+        return key + str(self.k) if self.connectivity == 'knn' else key
     
     def get_vertex_count(self) -> int:
         """Get the number of vertices in the graph"""
-        return len(self.vertices)
+        return len(self.names)
+    
+    def path_length(self, path: Sequence[int]) -> float:
+        """Length of a path of node ids, summed edge by edge in double precision"""
+        points = self.node_coordinates[list(path)].tolist()
+        total = 0
+        for i in range(1, len(points)):
+            total += math.dist(points[i - 1], points[i])
+        return total
+    
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the graph"""
+        if self.base is not None:
+            # Everything but the weights is shared with the base graph
+            return self.weights.nbytes
+        usage = self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes + self.rows.nbytes
+        usage += sys.getsizeof(self.names) + (0 if self.ids is self.vertices else 100 * len(self.ids))
+        if 'node_coordinates' in self.__dict__:
+            usage += self.node_coordinates.nbytes
+        if 'offsets' in self.__dict__:
+            usage += 36 * len(self.offsets)
+        if 'positions' in self.__dict__:
+            usage += 136 * len(self.positions)
+        if 'edges' in self.__dict__:
+            # Dict entry and tuple per location, (name, float) pair and float per edge
+            usage += 100 * len(self.names) + 88 * len(self.indices)
+        return usage
+
+
+def _merge_edges(count: int, *edge_sets) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Combine (first, second, distance) edge arrays, dropping duplicates in either direction"""
+    first = np.concatenate([np.minimum(a, b) for a, b, _ in edge_sets])
+    second = np.concatenate([np.maximum(a, b) for a, b, _ in edge_sets])
+    distance = np.concatenate([d for _, _, d in edge_sets])
+    _, unique = np.unique(first.astype(np.int64) * count + second, return_index=True)
+    return first[unique], second[unique], distance[unique]
+
 
+def _connected_components(count: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Label every location with the smallest location position of its connected component"""
+    labels = np.arange(count)
+    while True:
+        # Hook the larger label of every edge onto the smaller one, then flatten the label trees
+        low = np.minimum(labels[first], labels[second])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[first], low)
+        np.minimum.at(hooked, labels[second], low)
+        while True:
+            flattened = hooked[hooked]
+            if np.array_equal(flattened, hooked):
+                break
+            hooked = flattened
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
 
-def dijkstra(graph: CampusGraph, start: str, end: str) -> Tuple[Optional[List[str]], float]:
+
+def _bridge_components(grid: SpatialGrid, labels: np.ndarray, first: np.ndarray, second: np.ndarray,
+                       distance: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Connect every island to the closest location outside it until the graph is connected"""
+    labels = labels.copy()
+    bridges = []
+    while True:
+        components, sizes = np.unique(labels, return_counts=True)
+        if len(components) <= 1:
+            break
+        island = components[np.argmin(sizes)]
+        members = labels == island
+        inside, outside, bridge_distance = grid.nearest_outside(members)
+        bridges.append((min(inside, outside), max(inside, outside), bridge_distance))
+        labels[members] = labels[outside]
+    first = np.concatenate([first, np.array([b[0] for b in bridges], dtype=first.dtype)])
+    second = np.concatenate([second, np.array([b[1] for b in bridges], dtype=second.dtype)])
+    distance = np.concatenate([distance, np.array([b[2] for b in bridges])])
+    return first, second, distance
+
+
+def dijkstra(graph: CampusGraph, start: str, end: str,
+             stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
     """
     Find shortest path using Dijkstra's algorithm
     
+    Uses a binary heap with lazy deletion: a location may be queued several times and stale
+    entries are skipped when popped. The search stops as soon as the destination is settled, so
+    only the locations closer to the start than the destination are visited.
+    
     Args:
         graph: CampusGraph instance
         start: Starting location name
         end: Destination location name
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts of the search
     
     Returns:
         Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
     """
-    if start not in graph.vertices or end not in graph.vertices:
+    source, target = graph.ids.get(start), graph.ids.get(end)
+    if source is None or target is None:
         return None, float('inf')
+    return _route_result(graph, _shortest_path_ids(graph, source, target, None, stats))
+
+
+def a_star(graph: CampusGraph, start: str, end: str,
+           stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find shortest path using A* search
     
-    # Initialize distances and previous nodes
-    distances = {vertex: float('inf') for vertex in graph.vertices}
-    previous = {vertex: None for vertex in graph.vertices}
-    unvisited = set(graph.vertices.keys())
+    Edge weights are Euclidean distances between coordinates, so the straight-line (3D)
+    distance to the destination never overestimates the remaining route and the result is as
+    short as Dijkstra's. The heuristic steers the search towards the destination, so mostly the
+    locations between start and destination are expanded instead of a disc around the start.
     
-    # Set starting distance to 0
-    distances[start] = 0
+    Args:
+        graph: CampusGraph instance
+        start: Starting location name
+        end: Destination location name
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts of the search
     
-    while unvisited:
-        # Find the unvisited node with smallest distance
-        current = min(unvisited, key=lambda vertex: distances[vertex])
-        
-        # If we've reached the destination or the smallest distance is infinity, break
-        if current == end or distances[current] == float('inf'):
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    source, target = graph.ids.get(start), graph.ids.get(end)
+    if source is None or target is None:
+        return None, float('inf')
+    positions = graph.positions
+    goal = positions[target]
+    
+    def heuristic(node):
+        # Scaled down a little so that it stays below the single-precision edge weights
+        return math.dist(positions[node], goal) * HEURISTIC_SCALE
+    
+    return _route_result(graph, _shortest_path_ids(graph, source, target, heuristic, stats))
+
+
+def bidirectional_dijkstra(graph: CampusGraph, start: str, end: str,
+                           stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find shortest path with Dijkstra's algorithm run from both ends at once
+    
+    One search grows from the start and one from the destination, always advancing the one
+    whose frontier is closer, until they meet. Each only has to cover about half the distance,
+    so on long routes roughly half as many locations are settled as with dijkstra.
+    
+    Args:
+        graph: CampusGraph instance
+        start: Starting location name
+        end: Destination location name
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts of both searches
+    
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    source, target = graph.ids.get(start), graph.ids.get(end)
+    if source is None or target is None:
+        return None, float('inf')
+    return _route_result(graph, _bidirectional_path_ids(graph, source, target, stats))
+
+
+def contraction_hierarchy(graph: CampusGraph, start: str, end: str,
+                          stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find shortest path with the campus's contraction hierarchy (see contraction.py)
+    
+    Queries settle only a few hundred locations even on the largest campuses. The hierarchy is
+    loaded from disk if it was built for this data version (python contraction.py), and
+    otherwise built in the background on first use, which takes minutes on large campuses;
+    routes are searched with A* until it is ready (see _ContractionHierarchyLoader). It is built
+    without runtime closures; routes that cross a closed or slowed down element are searched with A*.
+    
+    Args:
+        graph: CampusGraph instance
+        start: Starting location name
+        end: Destination location name
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts of the query
+    
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    source, target = graph.ids.get(start), graph.ids.get(end)
+    if source is None or target is None:
+        return None, float('inf')
+    hierarchy = graph.state.derived('contraction_hierarchy').hierarchy
+    if hierarchy is None:
+        return a_star(graph, start, end, stats)
+    path = hierarchy.path(source, target, stats)
+    if path is not None and graph.is_affected(path):
+        return a_star(graph, start, end, stats)
+    return _route_result(graph, path)
+
+
+def all_pairs(graph: CampusGraph, start: str, end: str,
+              stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Look up the shortest path in the campus's precomputed all-pairs table
+    
+    The route is read off the next-hop matrix in O(route length) without searching. Campuses
+    too large for a table fall back to A*, as do all routes while the table is still being
+    computed in the background (see _AllPairsTableLoader) and routes that cross an element
+    closed or slowed down at runtime, as the table is computed without them.
+    
+    Args:
+        graph: CampusGraph instance
+        start: Starting location name
+        end: Destination location name
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts (zero for a lookup)
+    
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    table = graph.state.derived('all_pairs_table').table
+    if table is None:
+        return a_star(graph, start, end, stats)
+    source, target = graph.ids.get(start), graph.ids.get(end)
+    if source is None or target is None:
+        return None, float('inf')
+    path = table.path(source, target)
+    if path is None and np.isfinite(table.distances[source, target]):
+        # The lookup went round in circles, which ties in the table can cause; search instead
+        return a_star(graph, start, end, stats)
+    if path is not None and graph.is_affected(path):
+        return a_star(graph, start, end, stats)
+    _record_search_stats(stats, 0, 0)
+    return _route_result(graph, path)
+
+
+def _shortest_path_ids(graph: CampusGraph, source: int, target: int,
+                       heuristic: Optional[Callable[[int], float]],
+                       stats: Optional[Dict[str, int]]) -> Optional[List[int]]:
+    """
+    Heap-based Dijkstra (no heuristic) or A* search over the CSR arrays
+    Returns:
+        Path as a list of node ids, or None if the target cannot be reached
+    """
+    indptr, indices, weights = graph.offsets, graph.indices, graph.weights
+    
+    # Flat per-node lists are cheaper to index than dicts, even allocated for every search
+    count = len(graph.names)
+    distances = [float('inf')] * count
+    previous = [-1] * count
+    settled = bytearray(count)
+    distances[source] = 0
+    expanded, reached = 0, 1
+    # Entries are (distance so far + heuristic, distance so far, node); without a heuristic the
+    # first two are the same
+    queue = [(heuristic(source) if heuristic else 0, 0, source)]
+    
+    while queue:
+        _, distance, current = heapq.heappop(queue)
+        if settled[current]:
+            # Stale entry, the node was reached by a shorter path earlier
+            continue
+        if current == target:
             break
+        settled[current] = 1
+        expanded += 1
         
         # Update distances to neighbors
-        for neighbor, weight in graph.edges[current]:
-            if neighbor in unvisited:
-                new_distance = distances[current] + weight
-                if new_distance < distances[neighbor]:
-                    distances[neighbor] = new_distance
-                    previous[neighbor] = current
-        
-        unvisited.remove(current)
-    
-    # Reconstruct path
-    path = []
-    current = end
-    while current is not None:
-        path.append(current)
-        current = previous[current]
+        first, last = indptr[current], indptr[current + 1]
+        for neighbor, weight in zip(indices[first:last].tolist(), weights[first:last].tolist()):
+            if settled[neighbor]:
+                continue
+            new_distance = distance + weight
+            if new_distance < distances[neighbor]:
+                if previous[neighbor] < 0:
+                    reached += 1
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                estimate = new_distance + heuristic(neighbor) if heuristic else new_distance
+                heapq.heappush(queue, (estimate, new_distance, neighbor))
+    else:
+        # The queue ran out without reaching the destination
+        _record_search_stats(stats, expanded, reached)
+        return None
+    
+    _record_search_stats(stats, expanded, reached)
+    path = [target]
+    while path[-1] != source:
+        path.append(previous[path[-1]])
+    path.reverse()
+    return path
+
+
+def _bidirectional_path_ids(graph: CampusGraph, source: int, target: int,
+                            stats: Optional[Dict[str, int]]) -> Optional[List[int]]:
+    """
+    Bidirectional heap-based Dijkstra over the CSR arrays
+    Returns:
+        Path as a list of node ids, or None if the target cannot be reached
+    """
+    if source == target:
+        _record_search_stats(stats, 0, 1)
+        return [source]
+    indptr, indices, weights = graph.offsets, graph.indices, graph.weights
+    count = len(graph.names)
+    # Index 0 is the search from the source, index 1 the search from the target
+    distances = ([float('inf')] * count, [float('inf')] * count)
+    previous = ([-1] * count, [-1] * count)
+    settled = (bytearray(count), bytearray(count))
+    queues = ([(0, source)], [(0, target)])
+    distances[0][source] = 0
+    distances[1][target] = 0
+    expanded, reached = 0, 2
+    # Length of the shortest path found so far and the node where its two halves meet
+    best, meeting = float('inf'), -1
     
+    while queues[0] and queues[1]:
+        # Every path not found yet leaves both settled regions, so it is at least as long as the
+        # two smallest queued distances together; once that reaches `best`, `best` is optimal
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        distance, current = heapq.heappop(queues[side])
+        if settled[side][current]:
+            continue
+        settled[side][current] = 1
+        expanded += 1
+        
+        own_distances, own_previous, own_settled = distances[side], previous[side], settled[side]
+        other_distances = distances[1 - side]
+        first, last = indptr[current], indptr[current + 1]
+        for neighbor, weight in zip(indices[first:last].tolist(), weights[first:last].tolist()):
+            if own_settled[neighbor]:
+                continue
+            new_distance = distance + weight
+            if new_distance < own_distances[neighbor]:
+                if own_previous[neighbor] < 0:
+                    reached += 1
+                own_distances[neighbor] = new_distance
+                own_previous[neighbor] = current
+                heapq.heappush(queues[side], (new_distance, neighbor))
+                # A node reached from both sides joins a complete path
+                total = new_distance + other_distances[neighbor]
+                if total < best:
+                    best, meeting = total, neighbor
+    
+    _record_search_stats(stats, expanded, reached)
+    if meeting < 0:
+        return None
+    path = [meeting]
+    while path[-1] != source:
+        path.append(previous[0][path[-1]])
     path.reverse()
+    while path[-1] != target:
+        path.append(previous[1][path[-1]])
+    return path
+
+
+class _SearchArrays(NamedTuple):
+    """The parts of a CampusGraph that _single_source_ids needs, small enough to send to worker processes"""
+    offsets: List[int]
+    indices: np.ndarray
+    weights: np.ndarray
+    positions: List[Tuple[float, float, float]]
+
+
+def _single_source_ids(graph, sources: Sequence[int], targets: Optional[Sequence[int]] = None,
+                       target_count: Optional[int] = None,
+                       stats: Optional[Dict[str, int]] = None) -> Tuple[List[float], List[int]]:
+    """
+    Heap-based Dijkstra from one or more source nodes over the CSR arrays
     
-    # Return path if it starts with the start location
-    if path[0] == start:
-        return path, distances[end]
-    else:
+    Args:
+        graph: CampusGraph, or _SearchArrays in worker processes
+        sources: Start nodes, all at distance 0
+        targets: Stop as soon as all of these nodes are settled instead of settling every
+            reachable node
+        target_count: Stop as soon as this many of the targets are settled instead
+        stats: Optional dict that receives the 'expanded' and 'queued' node counts
+    
+    Returns:
+        Tuple of (distances, predecessors) by node id. Distances are exact for settled nodes and
+        upper bounds for nodes only reached; unreached nodes have inf and -1.
+    """
+    indptr, indices, weights = graph.offsets, graph.indices, graph.weights
+    count = len(indptr) - 1
+    distances = [float('inf')] * count
+    previous = [-1] * count
+    settled = bytearray(count)
+    for source in sources:
+        distances[source] = 0
+    remaining = -1
+    if targets is not None:
+        wanted = bytearray(count)
+        for target in targets:
+            wanted[target] = 1
+        remaining = sum(wanted)
+        if target_count is not None:
+            remaining = min(remaining, target_count)
+    expanded, reached = 0, len(sources)
+    queue = [(0, source) for source in sources]
+    heapq.heapify(queue)
+    
+    while queue and remaining:
+        distance, current = heapq.heappop(queue)
+        if settled[current]:
+            continue
+        settled[current] = 1
+        expanded += 1
+        if remaining > 0 and wanted[current]:
+            remaining -= 1
+            if not remaining:
+                break
+        first, last = indptr[current], indptr[current + 1]
+        for neighbor, weight in zip(indices[first:last].tolist(), weights[first:last].tolist()):
+            if settled[neighbor]:
+                continue
+            new_distance = distance + weight
+            if new_distance < distances[neighbor]:
+                if previous[neighbor] < 0:
+                    reached += 1
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance, neighbor))
+    
+    _record_search_stats(stats, expanded, reached)
+    return distances, previous
+
+
+def _exact_distances(graph, previous: List[int], nodes: Sequence[int]) -> Dict[int, float]:
+    """
+    Exact (double precision) lengths of the search tree paths to some reached nodes
+    
+    Each length is summed from the source outwards, edge by edge, exactly as
+    CampusGraph.path_length sums a route, so both give the same value for the same route.
+    Paths shared by several nodes are only summed once.
+    """
+    positions = graph.positions
+    lengths = {}
+    for node in nodes:
+        chain = []
+        while node not in lengths and previous[node] >= 0:
+            chain.append(node)
+            node = previous[node]
+        total = lengths.setdefault(node, 0.0)
+        for child in reversed(chain):
+            total += math.dist(positions[node], positions[child])
+            lengths[child] = total
+            node = child
+    return lengths
+
+
+class NearestFacilityTable:
+    """
+    The nearest location of one category for every location: a network Voronoi partition
+    
+    Built with a single Dijkstra search started from all locations of the category at once;
+    every location ends up in the search tree of the category location closest to it. Looking
+    up the nearest one is then O(1), and the route to it follows the tree.
+    """
+    
+    def __init__(self, graph: CampusGraph, facilities: Sequence[int]):
+        """
+        Args:
+            graph: CampusGraph instance
+            facilities: Node ids of the locations of the category
+        """
+        distances, previous = _single_source_ids(graph, facilities)
+        reached = [node for node, distance in enumerate(distances) if distance < float('inf')]
+        lengths = _exact_distances(graph, previous, reached)
+        self.distances = np.full(len(distances), np.inf)
+        self.distances[reached] = [lengths[node] for node in reached]
+        self.previous = np.array(previous, dtype=np.int32)
+        
+        # The facility of a node is the root of its search tree; find all roots by pointer jumping
+        facility = np.where(self.previous < 0, np.arange(len(previous)), self.previous)
+        while True:
+            jumped = facility[facility]
+            if np.array_equal(jumped, facility):
+                break
+            facility = jumped
+        facility[~np.isfinite(self.distances)] = -1
+        self.facility = facility.astype(np.int32)
+        for array in (self.distances, self.previous, self.facility):
+            array.flags.writeable = False
+    
+    def route(self, node: int) -> Optional[List[int]]:
+        """Route from a node to its nearest facility as node ids, None if it cannot reach any"""
+        if self.facility[node] < 0:
+            return None
+        path = [node]
+        while self.previous[path[-1]] >= 0:
+            path.append(int(self.previous[path[-1]]))
+        return path
+    
+    def memory_usage(self) -> int:
+        return self.distances.nbytes + self.previous.nbytes + self.facility.nbytes
+
+
+class _NearestFacilityTables:
+    """The NearestFacilityTable of every category asked for so far, for one data version"""
+    
+    def __init__(self, state: CampusState):
+        self.state = state
+        self._tables = {}
+        self._lock = threading.Lock()
+    
+    def get(self, category: str) -> NearestFacilityTable:
+        key = normalize_key(category)
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    graph = self.state.derived('campus_graph')
+                    table = NearestFacilityTable(graph, _category_nodes(self.state, graph, category))
+                    self._tables[key] = table
+        return table
+    
+    def memory_usage(self) -> int:
+        return sum(table.memory_usage() for table in list(self._tables.values()))
+
+
+def _route_result(graph: CampusGraph, path: Optional[List[int]]) -> Tuple[Optional[List[str]], float]:
+    """Translate a path of node ids back to location names and its exact length"""
+    if path is None:
         return None, float('inf')
+    return [graph.names[node] for node in path], graph.path_length(path)
+
+
+def _record_search_stats(stats: Optional[Dict[str, int]], expanded: int, queued: int):
+    if stats is not None:
+        stats['expanded'] = stats.get('expanded', 0) + expanded
+        stats['queued'] = stats.get('queued', 0) + queued
+
+
+# Point-to-point search algorithms selectable in find_route
+ROUTING_ALGORITHMS: Dict[str, Callable] = {
+    'astar': a_star,
+    'dijkstra': dijkstra,
+    'bidirectional': bidirectional_dijkstra,
+    'ch': contraction_hierarchy,
+    'all_pairs': all_pairs,
+}
+
+
+class _AllPairsTableLoader:
+    """
+    The all-pairs table of one data version, computed in a background thread
+    
+    A table saved for this data version loads in milliseconds, but computing one takes up to
+    about 20 seconds at ALL_PAIRS_MAX_LOCATIONS, far too long to wait for inside a request.
+    `table` stays None until it is ready, and all_pairs searches with A* meanwhile.
+    """
+    
+    def __init__(self, state: CampusState):
+        self.table = None
+        graph = state.derived('base_campus_graph')
+        if graph.get_vertex_count() > ALL_PAIRS_MAX_LOCATIONS:
+            return
+        if state.version:
+            self.table = AllPairsTable.load(AllPairsTable.file_path(graph.file_key), graph.get_vertex_count())
+        if self.table is None:
+            threading.Thread(target=self._compute, args=(state, graph), name='all-pairs-table',
+                             daemon=True).start()
+    
+    def _compute(self, state: CampusState, graph: CampusGraph):
+        if not state.version:
+            # Data that did not come from a file has no version to save the table under
+            self.table = AllPairsTable.compute(graph)
+        else:
+            self.table = AllPairsTable.load_or_compute(graph, graph.file_key)
+    
+    def memory_usage(self) -> int:
+        table = self.table
+        return 0 if table is None else table.memory_usage()
+
+
+def _build_campus_graph(state: CampusState) -> CampusGraph:
+    """The graph searches run on: the graph of the data with the campus's runtime overrides"""
+    graph = state.derived('base_campus_graph')
+    overrides = state.derived('graph_overrides')
+    return graph.with_overrides(overrides) if overrides else graph
+
+
+# Graph of the campus data alone, patched for new data versions
+register_derived('base_campus_graph', CampusGraph, CampusGraph.with_changes)
+# Closures and slowdowns set at runtime; they stay in effect when the data file is reloaded
+register_derived('graph_overrides', lambda state: GraphOverrides(), lambda overrides, state, diff: overrides)
+register_derived('campus_graph', _build_campus_graph)
+# Only started for campuses that route with the table, and then computed in the background
+register_derived('all_pairs_table', _AllPairsTableLoader, eager=False)
+
+
+class _ContractionHierarchyLoader:
+    """
+    The contraction hierarchy of one data version, built in a background thread
+    
+    Like the all-pairs table (see _AllPairsTableLoader), a hierarchy saved for this data version
+    is loaded right away, but building one takes minutes on large campuses. Once a campus has
+    used algorithm='ch', every new data version rebuilds it, and CampusState.carry_over must not
+    wait for that while the store is locked. `hierarchy` stays None until it is ready, and
+    contraction_hierarchy searches with A* meanwhile.
+    """
+    
+    def __init__(self, state: CampusState):
+        self.hierarchy = None
+        graph = state.derived('base_campus_graph')
+        if state.version:
+            self.hierarchy = ContractionHierarchy.load(hierarchy_path(graph.file_key), graph.get_vertex_count())
+        if self.hierarchy is None:
+            threading.Thread(target=self._build, args=(state, graph), name='contraction-hierarchy',
+                             daemon=True).start()
+    
+    def _build(self, state: CampusState, graph: CampusGraph):
+        if not state.version:
+            self.hierarchy = ContractionHierarchy.build(graph)
+        else:
+            self.hierarchy = ContractionHierarchy.load_or_build(graph, graph.file_key)
+    
+    def memory_usage(self) -> int:
+        hierarchy = self.hierarchy
+        return 0 if hierarchy is None else hierarchy.memory_usage()
 
 
-def get_directions_with_pathfinding(start: str, end: str) -> Tuple[Optional[List[str]], float]:
+# Only built for campuses that route with algorithm='ch', and then in the background
+register_derived('contraction_hierarchy', _ContractionHierarchyLoader, eager=False)
+# Nearest location of a category for every location, built per category on first use
+register_derived('nearest_facility_tables', _NearestFacilityTables)
+# Grid over the graph's nodes for nearest-location and radius queries; closures don't change it,
+# the queries leave closed locations out (CampusGraph.open_nodes)
+register_derived('location_grid',
+                 lambda state: SpatialGrid(state.derived('base_campus_graph').node_coordinates, CONNECTION_RADIUS))
+def _carry_over_route_cache(cache: RouteCache, state: CampusState, diff: CampusDiff) -> RouteCache:
+    """
+    Route cache of a new data version: the previous version's routes, except the ones the
+    changed locations can affect
+    
+    Routes through an added, removed or changed location are dropped, and so are routes that an
+    added or moved location could now shorten (see _route_invalidator). Edges between unchanged
+    locations stay the same in 'radius' graphs; 'knn' graphs can change anywhere, so they start
+    with an empty cache.
+    """
+    graph = state.derived('campus_graph')
+    if graph.connectivity != 'radius':
+        return RouteCache(cache.max_size)
+    names = diff.affected_names
+    added = {graph.ids[name] for name in diff.added_names if name in graph.ids}
+    shortened = _route_invalidator(graph, added, set(), True)
+    
+    def is_stale(start: str, end: str, profile: str, path: Optional[Sequence[str]], distance: float) -> bool:
+        if path is not None and any(name in names or name not in graph.ids for name in path):
+            return True
+        return shortened(start, end, profile, path, distance)
+    
+    return cache.copy_without(is_stale)
+
+
+# Routes of one data version; a new version keeps the routes the data change cannot affect
+register_derived('route_cache', lambda state: RouteCache(), _carry_over_route_cache)
+
+
+def get_campus_graph(campus: Campus = None) -> CampusGraph:
+    """
+    Get the graph for the current campus data
+    
+    The graph is built on first use, once per data version, and the same frozen instance is
+    shared by all threads and sessions. When the data file changes, the next version's graph is
+    derived from it (see CampusGraph.with_changes) and swapped in together with the new data.
+    Runtime closures (see set_edge_factor) swap in a graph with changed weights
+    (CampusGraph.with_overrides).
+    """
+    return resolve_state(campus).derived('campus_graph')
+
+
+def default_algorithm(graph: CampusGraph) -> str:
+    """The all-pairs table lookup for campuses small enough to have one, A* otherwise"""
+    return 'all_pairs' if graph.get_vertex_count() <= ALL_PAIRS_MAX_LOCATIONS else 'astar'
+
+
+def find_route(start: str, end: str, campus: Campus = None, algorithm: Optional[str] = None,
+               stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find the shortest route between two locations
+    
+    Routes are kept in the campus's route cache (see route_cache.py), so repeated requests for
+    the same pair, in either direction, are answered without searching again.
+    
+    Args:
+        start: Starting location name
+        end: Destination location name
+        campus: Campus handle or data version to route on, defaults to the current default campus
+        algorithm: Name of the search in ROUTING_ALGORITHMS, defaults to default_algorithm(graph)
+        stats: Optional dict that receives the search's node counts; nothing is added for
+            routes served from the cache
+    
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    if algorithm is not None and algorithm not in ROUTING_ALGORITHMS:
+        raise ValueError(f"Unknown routing algorithm '{algorithm}'")
+    state = resolve_state(campus)
+    cache = state.derived('route_cache')
+    # Read before the graph, so a route searched on a graph that has been replaced meanwhile
+    # is not stored (see RouteCache.put)
+    generation = cache.generation
+    graph = state.derived('campus_graph')
+    algorithm = algorithm or default_algorithm(graph)
+    if start not in graph.ids or end not in graph.ids:
+        return None, float('inf')
+    
+    route = cache.get(start, end, algorithm)
+    if route is None:
+        route = ROUTING_ALGORITHMS[algorithm](graph, start, end, stats)
+        cache.put(start, end, algorithm, *route, generation=generation)
+    return route
+
+
+def route_cache_stats(campus: Campus = None) -> Dict[str, int]:
+    """Size and hit, miss and eviction counts of the route cache of the current data version"""
+    return resolve_state(campus).derived('route_cache').stats()
+
+
+def get_directions_with_pathfinding(start: str, end: str, campus: Campus = None, algorithm: Optional[str] = None,
+                                    stats: Optional[Dict[str, int]] = None) -> Tuple[Optional[List[str]], float]:
     """
     Get directions between two locations using pathfinding algorithm
     
     Args:
         start: Starting location name
         end: Destination location name
+        campus: Campus handle, defaults to the default campus
+        algorithm: Name of the search in ROUTING_ALGORITHMS; by default routes on campuses of
+            up to ALL_PAIRS_MAX_LOCATIONS locations are looked up in the all-pairs table, which
+            is computed once per data version, and larger campuses are searched with A*
+        stats: Optional dict that receives the search's node counts (e.g. stats['expanded'])
     
     Returns:
         Tuple of (list of directions/steps, total distance) or (None, float('inf')) if no path
     """
-    graph = CampusGraph()
-    
     # Find shortest path
-    path, distance = dijkstra(graph, start, end)
+    path, distance = find_route(start, end, campus, algorithm, stats)
     
     if path is None:
         return None, float('inf')
@@ -145,45 +1144,668 @@ def get_directions_with_pathfinding(start: str, end: str) -> Tuple[Optional[List
     return directions, distance
 
 
-def get_directions(start: str, end: str) -> Optional[List[str]]:
+def get_directions(start: str, end: str, campus: Campus = None) -> Optional[List[str]]:
     """
     Get directions between two locations
     
     Args:
         start: Starting location name
         end: Destination location name
+        campus: Campus handle, defaults to the default campus
     
     Returns:
         List of directions/steps or None if no path exists
     """
-    directions, _ = get_directions_with_pathfinding(start, end)
+    directions, _ = get_directions_with_pathfinding(start, end, campus)
     return directions
 
 
-def calculate_distance(start: str, end: str) -> float:
+def calculate_distance(start: str, end: str, campus: Campus = None) -> float:
     """
     Calculate straight-line distance between two locations
     
     Args:
         start: Starting location name
         end: Destination location name
+        campus: Campus handle, defaults to the default campus
     
     Returns:
         Distance in coordinate units or float('inf') if location doesn't exist
     """
-    start_info = get_location_by_name(start)
-    end_info = get_location_by_name(end)
+    state = resolve_state(campus)
+    start_info = state.get_location_by_name(start)
+    end_info = state.get_location_by_name(end)
     
     if not start_info or not end_info:
         return float('inf')
     
-    start_coord = start_info['coordinates']
-    end_coord = end_info['coordinates']
+    return state.coordinate_store.distance(start_info['name'], end_info['name'])
+
+
+def distance_matrix(origins: Sequence[str], destinations: Sequence[str], campus: Campus = None,
+                    processes: Optional[int] = None) -> np.ndarray:
+    """
+    Route distances from every origin to every destination
+    
+    Runs one Dijkstra search per origin that stops as soon as every destination is settled,
+    instead of one search per pair of locations.
+    
+    Args:
+        origins: Location names, one row each
+        destinations: Location names, one column each
+        campus: Campus handle, defaults to the default campus
+        processes: Spread the origins over this many worker processes; worthwhile for hundreds
+            of origins on large campuses. None searches in this process.
+    
+    Returns:
+        (len(origins), len(destinations)) float64 array of route lengths, as find_route would
+        report them, with inf where there is no route or a location doesn't exist
+    """
+    graph = get_campus_graph(campus)
+    origin_ids = [graph.ids.get(name, -1) for name in origins]
+    destination_ids = [graph.ids.get(name, -1) for name in destinations]
+    
+    if not processes or processes < 2 or len(origin_ids) < 2:
+        return _distance_rows(graph, origin_ids, destination_ids)
+    arrays = _SearchArrays(graph.offsets, graph.indices, graph.weights, graph.positions)
+    chunks = [chunk.tolist() for chunk in np.array_split(origin_ids, min(processes, len(origin_ids)))]
+    with ProcessPoolExecutor(len(chunks)) as pool:
+        rows = pool.map(_distance_rows, [arrays] * len(chunks), chunks, [destination_ids] * len(chunks))
+        return np.vstack(list(rows))
+
+
+def _distance_rows(graph, origin_ids: List[int], destination_ids: List[int]) -> np.ndarray:
+    """Distance matrix rows of some origins; ids of unknown locations are -1"""
+    matrix = np.full((len(origin_ids), len(destination_ids)), np.inf)
+    targets = [node for node in set(destination_ids) if node >= 0]
+    for row, origin in enumerate(origin_ids):
+        if origin < 0:
+            continue
+        distances, previous = _single_source_ids(graph, [origin], targets)
+        reached = [node for node in targets if distances[node] < float('inf')]
+        lengths = _exact_distances(graph, previous, reached)
+        matrix[row] = [lengths.get(node, np.inf) for node in destination_ids]
+    return matrix
+
+
+Point = Union[str, Sequence[float]]
+
+
+def _resolve_point(state: CampusState, graph: CampusGraph, point_or_name: Point) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Coordinates of a point given as [x, y, z] or as a location name
+    Returns:
+        Tuple of (coordinates or None for an unknown name, node id of the named location or -1)
+    """
+    if not isinstance(point_or_name, str):
+        return np.asarray(point_or_name, dtype=np.float64), -1
+    row = state.by_name.get(normalize_key(point_or_name))
+    node = -1 if row is None else graph.ids.get(state.names[row], -1)
+    if node < 0:
+        return None, -1
+    return graph.node_coordinates[node], node
+
+
+def _category_nodes(state: CampusState, graph: CampusGraph, category: str) -> List[int]:
+    """Node ids of the locations of a category"""
+    nodes = (graph.ids.get(state.names[row], -1) for row in state.by_category.get(normalize_key(category), []))
+    return sorted({node for node in nodes if node >= 0})
+
+
+def _category_mask(state: CampusState, graph: CampusGraph, category: str) -> np.ndarray:
+    """Boolean array over the graph's nodes marking the locations of a category"""
+    mask = np.zeros(graph.get_vertex_count(), dtype=bool)
+    mask[_category_nodes(state, graph, category)] = True
+    return mask
+
+
+def nearest_locations(point_or_name: Point, k: int = 5, category: Optional[str] = None,
+                      campus: Campus = None) -> List[Tuple[str, float]]:
+    """
+    Find the locations closest (in a straight line) to a point or to another location
+    
+    Locations closed at runtime (see close_location) are left out.
+    
+    Args:
+        point_or_name: [x, y, z] coordinates, or a location name, which is left out of the results
+        k: Number of locations
+        category: Only consider locations of this category
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        List of (location name, distance) tuples, nearest first; empty if the location doesn't exist
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    point, node = _resolve_point(state, graph, point_or_name)
+    if point is None:
+        return []
+    mask = _category_mask(state, graph, category) if category is not None else None
+    if graph.open_nodes is not None:
+        mask = graph.open_nodes.copy() if mask is None else mask & graph.open_nodes
+    if node >= 0:
+        if mask is None:
+            mask = np.ones(graph.get_vertex_count(), dtype=bool)
+        mask[node] = False
+    nodes, distances = state.derived('location_grid').nearest(point, k, mask)
+    return [(graph.names[node], distance) for node, distance in zip(nodes.tolist(), distances.tolist())]
+
+
+def locations_within(point: Point, radius: float, campus: Campus = None) -> List[Tuple[str, float]]:
+    """
+    Find the locations within a straight-line distance of a point or of another location
+    
+    Locations closed at runtime (see close_location) are left out.
+    
+    Args:
+        point: [x, y, z] coordinates, or a location name, which is left out of the results
+        radius: Maximum distance
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        List of (location name, distance) tuples, nearest first; empty if the location doesn't exist
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    point, node = _resolve_point(state, graph, point)
+    if point is None:
+        return []
+    nodes, distances = state.derived('location_grid').within(point, radius)
+    if graph.open_nodes is not None:
+        nodes, distances = nodes[graph.open_nodes[nodes]], distances[graph.open_nodes[nodes]]
+    return [(graph.names[found], distance) for found, distance in zip(nodes.tolist(), distances.tolist())
+            if found != node]
+
+
+def snap_to_graph(point: Sequence[float], campus: Campus = None) -> Tuple[Optional[str], float]:
+    """
+    Find the graph location nearest to arbitrary coordinates, where a route from there would start
+    
+    Locations closed at runtime (see close_location) are skipped, a route cannot start there.
+    
+    Args:
+        point: [x, y, z] coordinates
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Tuple of (location name, straight-line distance to it) or (None, float('inf')) if the campus
+        has no open location
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    nodes, distances = state.derived('location_grid').nearest(point, 1, graph.open_nodes)
+    if not len(nodes):
+        return None, float('inf')
+    return graph.names[int(nodes[0])], float(distances[0])
+
+
+def find_route_from_point(point: Sequence[float], end: str, campus: Campus = None,
+                          algorithm: Optional[str] = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find the shortest route from arbitrary coordinates to a location
+    
+    The coordinates are snapped to the nearest location (see snap_to_graph) and the route
+    starts there; the returned distance includes the straight-line walk to that location.
+    
+    Args:
+        point: [x, y, z] coordinates
+        end: Destination location name
+        campus: Campus handle, defaults to the default campus
+        algorithm: Name of the search in ROUTING_ALGORITHMS, defaults to default_algorithm(graph)
+    
+    Returns:
+        Tuple of (path as list of location names, total distance) or (None, float('inf')) if no path
+    """
+    # Snap and route on the same data version
+    state = resolve_state(campus)
+    start, offset = snap_to_graph(point, state)
+    if start is None:
+        return None, float('inf')
+    path, distance = find_route(start, end, state, algorithm)
+    if path is None:
+        return None, float('inf')
+    return path, distance + offset
+
+
+def nearest_by_category(start: str, category: str, k: int = 3,
+                        campus: Campus = None) -> List[Tuple[str, float, List[str]]]:
+    """
+    Find the locations of a category with the shortest routes from a location
+    
+    One Dijkstra search from the start stops as soon as k locations of the category are
+    settled, instead of one route search per candidate. A start in the category is its own
+    nearest location.
+    
+    Args:
+        start: Starting location name
+        category: Category of the locations to find, e.g. 'Auxiliary Services'
+        k: Number of locations
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        List of (location name, route distance, route as list of location names) tuples,
+        nearest first; fewer than k if fewer can be reached
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    source = graph.ids.get(start)
+    candidates = _category_nodes(state, graph, category)
+    if source is None or not candidates or k < 1:
+        return []
+    distances, previous = _single_source_ids(graph, [source], candidates, target_count=k)
+    # Settled candidates are the ones with the smallest distances
+    found = sorted((node for node in candidates if distances[node] < float('inf')),
+                   key=lambda node: distances[node])[:k]
+    lengths = _exact_distances(graph, previous, found)
+    results = []
+    for node in found:
+        path = [node]
+        while path[-1] != source:
+            path.append(previous[path[-1]])
+        path.reverse()
+        results.append((graph.names[node], lengths[node], [graph.names[step] for step in path]))
+    return results
+
+
+def nearest_facility(start: str, category: str, campus: Campus = None) -> Tuple[Optional[List[str]], float]:
+    """
+    Find the route to the nearest location of a category with a precomputed table
+    
+    The first request for a category builds its NearestFacilityTable (one multi-source search
+    over the whole campus); after that every request for the category is a lookup.
+    
+    Args:
+        start: Starting location name
+        category: Category of the location to find
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Tuple of (route as list of location names ending at the nearest location of the
+        category, route distance) or (None, float('inf')) if none can be reached
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    node = graph.ids.get(start)
+    if node is None:
+        return None, float('inf')
+    table = state.derived('nearest_facility_tables').get(category)
+    path = table.route(node)
+    if path is None:
+        return None, float('inf')
+    return [graph.names[step] for step in path], float(table.distances[node])
+
+
+def _reachable_ids(graph: CampusGraph, source: int, max_distance: float) -> Dict[int, float]:
+    """
+    Dijkstra search bounded by a route distance budget
+    
+    Nodes beyond the budget are never queued, and the per-node state lives in dicts instead of
+    lists over the whole graph, so the cost depends only on the size of the reachable area.
+    
+    Returns:
+        Dict of node id -> exact route length for every node within max_distance of the source
+    """
+    indptr, indices, weights = graph.offsets, graph.indices, graph.weights
+    # The search sums single-precision weights; give it a little slack and compare the exact
+    # lengths with the budget instead
+    limit = max_distance * (1 + 1e-6) + 1e-9
+    distances = {source: 0}
+    previous = {source: -1}
+    settled = set()
+    queue = [(0, source)]
+    
+    while queue:
+        distance, current = heapq.heappop(queue)
+        if current in settled:
+            continue
+        settled.add(current)
+        first, last = indptr[current], indptr[current + 1]
+        for neighbor, weight in zip(indices[first:last].tolist(), weights[first:last].tolist()):
+            new_distance = distance + weight
+            if new_distance <= limit and new_distance < distances.get(neighbor, limit + 1):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance, neighbor))
+    
+    lengths = _exact_distances(graph, previous, list(settled))
+    return {node: length for node, length in lengths.items() if length <= max_distance}
+
+
+def reachable_within(start: str, max_distance: float,
+                     campus: Campus = None) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Find every location that can be reached from a location within a route distance budget
+    
+    Args:
+        start: Starting location name, which is left out of the results
+        max_distance: Maximum route distance
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Dict of category -> list of (location name, route distance) tuples, nearest first;
+        empty if the location doesn't exist
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    source = graph.ids.get(start)
+    if source is None or max_distance < 0:
+        return {}
+    by_category = {}
+    for node, distance in sorted(_reachable_ids(graph, source, max_distance).items(), key=lambda item: item[1]):
+        if node != source:
+            category = state.categories[graph.rows[node]]
+            by_category.setdefault(category, []).append((graph.names[node], distance))
+    return by_category
+
+
+class Tour(NamedTuple):
+    """A planned multi-stop tour"""
+    # Location names in visiting order, from the start to the end of the tour
+    stops: List[str]
+    # Location names of the whole walk, or None if some stop cannot be reached
+    path: Optional[List[str]]
+    distance: float
+
+
+def plan_tour(stops: Sequence[str], start: Optional[str] = None, end: Optional[str] = None,
+              campus: Campus = None, time_budget: float = TOUR_TIME_BUDGET) -> Tour:
+    """
+    Plan a short walk that visits a set of locations in any order
+    
+    Runs one search per stop to get the route distances between all stops, orders the stops
+    with tour.plan_order and joins the routes between consecutive stops, read off the same
+    search trees, into one path.
+    
+    Args:
+        stops: Location names to visit, in any order
+        start: Location the tour starts at, defaults to the first stop
+        end: Location the tour must end at (the start for a round trip), None to end anywhere
+        campus: Campus handle, defaults to the default campus
+        time_budget: Seconds spent improving the visiting order
+    
+    Returns:
+        Tour with the visiting order, the full path and its distance (None and inf if some stop
+        cannot be reached)
+    
+    Raises:
+        ValueError: If a location doesn't exist in the campus data
+    """
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    names = list(stops) + [name for name in (start, end) if name is not None]
+    unknown = [name for name in names if state.by_name.get(normalize_key(name)) is None]
+    if unknown:
+        raise ValueError(f"Unknown locations: {', '.join(unknown)}")
+    if not names:
+        return Tour([], [], 0.0)
+    
+    # Canonical spelling of the names, and every stop once
+    ids = [graph.ids[state.names[state.by_name[normalize_key(name)]]] for name in names]
+    start_id = ids[len(stops)] if start is not None else ids[0]
+    end_id = ids[-1] if end is not None else None
+    nodes = [start_id] + [node for node in dict.fromkeys(ids[:len(stops)]) if node not in (start_id, end_id)]
+    if end_id is not None:
+        nodes.append(end_id)
+    
+    matrix = np.full((len(nodes), len(nodes)), np.inf)
+    trees = {}
+    for row, node in enumerate(nodes):
+        if node not in trees:
+            distances, previous = _single_source_ids(graph, [node], nodes)
+            reached = [target for target in nodes if distances[target] < float('inf')]
+            trees[node] = (previous, _exact_distances(graph, previous, reached))
+        lengths = trees[node][1]
+        matrix[row] = [lengths.get(target, np.inf) for target in nodes]
+    
+    order = plan_order(matrix, 0, len(nodes) - 1 if end_id is not None else None, time_budget)
+    visits = [nodes[index] for index in order]
+    path = [visits[0]]
+    for source, target in zip(visits, visits[1:]):
+        previous = trees[source][0]
+        if target != source and previous[target] < 0:
+            return Tour([graph.names[node] for node in visits], None, float('inf'))
+        leg = [target]
+        while leg[-1] != source:
+            leg.append(previous[leg[-1]])
+        path.extend(reversed(leg[:-1]))
+    return Tour([graph.names[node] for node in visits], [graph.names[node] for node in path],
+                graph.path_length(path))
+
+
+MEETING_OBJECTIVES = ('minmax', 'sum')
+
+
+def meeting_point(locations: Sequence[str], objective: str = 'minmax', category: Optional[str] = None,
+                  campus: Campus = None) -> Tuple[Optional[str], List[float]]:
+    """
+    Find the best location for a group to meet
+    
+    Runs one search per participant and combines the distance vectors of all searches with
+    NumPy, instead of routing every participant to every candidate location.
+    
+    Args:
+        locations: Current location name of every participant
+        objective: 'minmax' to minimize the longest walk of any participant (ties broken by the
+            total), 'sum' to minimize the total walk of the group
+        category: Only meet at locations of this category, e.g. 'Auxiliary Services'
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Tuple of (meeting location name, route distance of every participant in the order of
+        locations) or (None, []) if no candidate can be reached by everybody
+    
+    Raises:
+        ValueError: If the objective is unknown or a location doesn't exist in the campus data
+    """
+    if objective not in MEETING_OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {', '.join(MEETING_OBJECTIVES)}")
+    state = resolve_state(campus)
+    graph = state.derived('campus_graph')
+    unknown = [name for name in locations if state.by_name.get(normalize_key(name)) is None]
+    if unknown:
+        raise ValueError(f"Unknown locations: {', '.join(unknown)}")
+    sources = [graph.ids[state.names[state.by_name[normalize_key(name)]]] for name in locations]
+    candidates = _category_nodes(state, graph, category) if category is not None else None
+    if not sources or candidates == []:
+        return None, []
+    
+    # Searches of a category stop once all of its locations are settled
+    searches = {source: _single_source_ids(graph, [source], candidates) for source in dict.fromkeys(sources)}
+    columns = np.arange(graph.get_vertex_count()) if candidates is None else np.array(candidates)
+    vectors = np.array([searches[source][0] for source in sources])[:, columns]
+    longest, total = vectors.max(axis=0), vectors.sum(axis=0)
+    ranking = np.lexsort((total, longest) if objective == 'minmax' else (longest, total))
+    best = ranking[0]
+    if not np.isfinite(longest[best]):
+        return None, []
+    node = int(columns[best])
+    lengths = {source: _exact_distances(graph, previous, [node])[node]
+               for source, (_, previous) in searches.items()}
+    return graph.names[node], [lengths[source] for source in sources]
+
+
+# Serializes changes to the overrides, which read the current ones and replace them
+_overrides_lock = threading.Lock()
+
+
+@contextmanager
+def _changing_overrides(campus: Campus) -> Iterator[CampusState]:
+    """
+    The data version whose overrides to change, with reloads of the campus held off meanwhile:
+    a reload running at the same time could carry the old overrides over to the next version,
+    or swap it in right after the change, and the change would be lost
+    """
+    # Build the graph up front, the store stays locked for as long as the change takes
+    resolve_state(campus).derived('base_campus_graph')
+    if isinstance(campus, CampusState):
+        with _overrides_lock:
+            yield campus
+        return
+    with (campus or get_store()).holding_reloads() as state, _overrides_lock:
+        yield state
+
+
+def graph_overrides(campus: Campus = None) -> GraphOverrides:
+    """The closures and slowdowns currently in effect on a campus"""
+    return resolve_state(campus).derived('graph_overrides')
+
+
+def set_edge_factor(start: str, end: str, factor: float, campus: Campus = None) -> int:
+    """
+    Close, reopen or slow down the direct connection between two neighboring locations
+    
+    The change applies at once to every session routing on the campus, and stays in effect
+    when the data file is reloaded. The graph is not rebuilt, only its weights are recomputed,
+    and of the cached routes only the ones the change can affect are dropped.
+    
+    Args:
+        start: Location name at one end of the connection
+        end: Location name at the other end
+        factor: Multiplies the cost of walking the connection: float('inf') closes it, 1 reopens
+            it, 2 makes it count twice as long
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Number of cached routes dropped
+    
+    Raises:
+        ValueError: If the factor is below 1, or the locations don't exist or aren't neighbors
+    """
+    _check_factor(factor)
+    with _changing_overrides(campus) as state:
+        base = state.derived('base_campus_graph')
+        first, second = base.ids.get(start), base.ids.get(end)
+        if first is None or second is None:
+            raise ValueError(f"Unknown location '{start if first is None else end}'")
+        if base._edge_position(first, second) < 0:
+            raise ValueError(f"'{start}' and '{end}' are not directly connected")
+        overrides = state.derived('graph_overrides')
+        relaxed = factor < overrides.edge_factor(start, end)
+        edge = (min(first, second), max(first, second))
+        return _apply_overrides(state, overrides.with_edge_factor(start, end, factor), set(), {edge}, relaxed)
+
+
+def set_location_factor(name: str, factor: float, campus: Campus = None) -> int:
+    """
+    Close, reopen or slow down a location: every connection to it
+    
+    Works like set_edge_factor. Routes from or to a closed location are not found until it is
+    reopened.
+    
+    Args:
+        name: Location name
+        factor: Multiplies the cost of every connection of the location: float('inf') closes
+            it, 1 reopens it
+        campus: Campus handle, defaults to the default campus
+    
+    Returns:
+        Number of cached routes dropped
+    
+    Raises:
+        ValueError: If the factor is below 1 or the location doesn't exist
+    """
+    _check_factor(factor)
+    with _changing_overrides(campus) as state:
+        node = state.derived('base_campus_graph').ids.get(name)
+        if node is None:
+            raise ValueError(f"Unknown location '{name}'")
+        overrides = state.derived('graph_overrides')
+        relaxed = factor < overrides.location_factor(name)
+        return _apply_overrides(state, overrides.with_location_factor(name, factor), {node}, set(), relaxed)
+
+
+def close_edge(start: str, end: str, campus: Campus = None) -> int:
+    """Close the direct connection between two neighboring locations (see set_edge_factor)"""
+    return set_edge_factor(start, end, float('inf'), campus)
+
+
+def reopen_edge(start: str, end: str, campus: Campus = None) -> int:
+    """Undo close_edge or set_edge_factor for a connection"""
+    return set_edge_factor(start, end, 1.0, campus)
+
+
+def close_location(name: str, campus: Campus = None) -> int:
+    """Close a location and all its connections (see set_location_factor)"""
+    return set_location_factor(name, float('inf'), campus)
+
+
+def reopen_location(name: str, campus: Campus = None) -> int:
+    """Undo close_location or set_location_factor for a location"""
+    return set_location_factor(name, 1.0, campus)
+
+
+def _check_factor(factor: float):
+    # Factors below 1 would make the straight-line A* heuristic overestimate
+    if not factor >= 1:
+        raise ValueError(f"Weight factor must be at least 1, got {factor}")
+
+
+def _apply_overrides(state: CampusState, overrides: GraphOverrides, nodes: Set[int],
+                     edges: Set[Tuple[int, int]], relaxed: bool) -> int:
+    """
+    Swap in the graph for new overrides and drop the cached routes the change can affect
+    
+    Args:
+        state: Campus data version the overrides apply to
+        overrides: The new overrides
+        nodes: Node ids of the changed locations
+        edges: (smaller id, larger id) of the changed connections
+        relaxed: Whether the change made the elements cheaper (reopened them), which can
+            shorten routes that don't use them yet
+    
+    Returns:
+        Number of cached routes dropped
+    """
+    base = state.derived('base_campus_graph')
+    graph = base.with_overrides(overrides) if overrides else base
+    # The nearest-facility tables are rebuilt on demand for the new graph; the all-pairs table
+    # and the contraction hierarchy stay, their routes are checked against the overrides
+    state.replace_derived({
+        'graph_overrides': overrides,
+        'campus_graph': graph,
+        'nearest_facility_tables': _NearestFacilityTables(state),
+    })
+    return state.derived('route_cache').discard(_route_invalidator(graph, nodes, edges, relaxed))
+
+
+def _route_invalidator(graph: CampusGraph, nodes: Set[int], edges: Set[Tuple[int, int]],
+                       relaxed: bool) -> Callable[..., bool]:
+    """
+    Predicate for RouteCache.discard selecting the cached routes a change to some locations
+    and connections can affect
+    
+    A route through a changed element now costs something else, so it is always dropped. A
+    route that avoids every element is still the shortest after elements were closed or slowed
+    down, as no other route got cheaper. After elements were reopened or sped up, a route
+    through one of them may now be shorter; it can't be shorter than the straight-line distance
+    from the start to the element plus the element's cost plus the straight line on to the
+    destination, so only routes that cost more than that bound (and pairs that had no route)
+    are dropped.
+    """
+    positions = graph.positions
     
-    distance = math.sqrt(
-        (start_coord[0] - end_coord[0])**2 +
-        (start_coord[1] - end_coord[1])**2 +
-        (start_coord[2] - end_coord[2])**2
-    )
+    def is_stale(start: str, end: str, profile: str, path: Optional[Sequence[str]], distance: float) -> bool:
+        if path is None:
+            return relaxed
+        ids = [graph.ids[name] for name in path]
+        if any(node in nodes for node in ids):
+            return True
+        if any((min(first, second), max(first, second)) in edges for first, second in zip(ids, ids[1:])):
+            return True
+        if not relaxed:
+            return False
+        origin, destination = positions[ids[0]], positions[ids[-1]]
+        # Some slack for the single-precision weights the cost is summed from
+        cost = graph.path_cost(ids) * (1 + 1e-6)
+        for node in nodes:
+            if math.dist(origin, positions[node]) + math.dist(positions[node], destination) < cost:
+                return True
+        for first, second in edges:
+            via = float(graph.weights[graph._edge_position(first, second)]) + min(
+                math.dist(origin, positions[first]) + math.dist(positions[second], destination),
+                math.dist(origin, positions[second]) + math.dist(positions[first], destination))
+            if via < cost:
+                return True
+        return False
     
-    return distance
\ No newline at end of file
+    return is_stale
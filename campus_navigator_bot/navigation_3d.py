@@ -1,68 +1,86 @@
 import plotly.graph_objects as go
-from campus_data import get_coordinates_map, location_exists, get_location_by_name
-from navigation import get_directions_with_pathfinding
+from campus_data import Campus, CampusState, get_coordinate_store, normalize_key, register_derived, resolve_state
+from navigation import find_route, reachable_within
 
 
-def show_campus_3d_map(current_location: str, target_location: str):
-    """
-    Create and display a 3D visualization of the campus highlighting current and target locations
-    and showing the route between them
-    Args:
-        current_location: The user's current location
-        target_location: The destination location
-    """
-    # Validate locations exist
-    if not location_exists(current_location):
-        raise ValueError(f"Current location '{current_location}' does not exist in the campus data.")
-    
-    if not location_exists(target_location):
-        raise ValueError(f"Target location '{target_location}' does not exist in the campus data.")
-    
-    # Get all coordinates
-    coordinates_map = get_coordinates_map()
-    
-    # Prepare data for plotting
-    all_names = list(coordinates_map.keys())
-    all_coords = list(coordinates_map.values())
-    
-    # Extract x, y, z coordinates
-    x_coords = [coord[0] for coord in all_coords]
-    y_coords = [coord[1] for coord in all_coords]
-    z_coords = [coord[2] for coord in all_coords]
-    
-    # Create the 3D scatter plot
+def _build_base_figure(state: CampusState) -> go.Figure:
+    """Build the part of the 3D map that only depends on the campus data: all locations and the axes"""
+    coordinate_store = state.coordinate_store
     fig = go.Figure()
     
     # Add all campus locations as regular markers
     fig.add_trace(go.Scatter3d(
-        x=x_coords,
-        y=y_coords,
-        z=z_coords,
+        x=coordinate_store.x,
+        y=coordinate_store.y,
+        z=coordinate_store.z,
         mode='markers+text',
         marker=dict(
             size=8,
             color='lightblue',
             opacity=0.6
         ),
-        text=all_names,
+        text=list(coordinate_store.names),
         textposition="top center",
         name='Campus Locations'
     ))
     
+    fig.update_layout(
+        scene=dict(
+            xaxis_title='X Coordinate',
+            yaxis_title='Y Coordinate',
+            zaxis_title='Z Coordinate',
+            camera=dict(
+                eye=dict(x=1.5, y=1.5, z=1.5)
+            )
+        ),
+        width=900,
+        height=700,
+        showlegend=True
+    )
+    return fig
+
+
+register_derived('campus_3d_base_figure', _build_base_figure)
+
+
+def show_campus_3d_map(current_location: str, target_location: str, campus: Campus = None):
+    """
+    Create and display a 3D visualization of the campus highlighting current and target locations
+    and showing the route between them
+    Args:
+        current_location: The user's current location
+        target_location: The destination location
+        campus: Campus handle, defaults to the default campus
+    """
+    # Work on a single data version even if a reload is swapped in while the map is built
+    state = resolve_state(campus)
+    current_row = state.by_name.get(normalize_key(current_location))
+    target_row = state.by_name.get(normalize_key(target_location))
+    
+    # Validate locations exist
+    if current_row is None:
+        raise ValueError(f"Current location '{current_location}' does not exist in the campus data.")
+    
+    if target_row is None:
+        raise ValueError(f"Target location '{target_location}' does not exist in the campus data.")
+    
+    # Use the canonical spelling of the names, the user may have typed them in any case
+    current_location = state.names[current_row]
+    target_location = state.names[target_row]
+    coordinate_store = state.coordinate_store
+    
+    # Start from a copy of the cached figure with all campus locations
+    fig = go.Figure(state.derived('campus_3d_base_figure'))
+    
     # Get the route path between locations
-    route_path, total_distance = get_directions_with_pathfinding(current_location, target_location)
+    route_path, total_distance = find_route(current_location, target_location, state)
     
     if route_path:
         # Extract coordinates for the route path
-        route_x = []
-        route_y = []
-        route_z = []
-        
-        for location in route_path:
-            coords = coordinates_map[location]
-            route_x.append(coords[0])
-            route_y.append(coords[1])
-            route_z.append(coords[2])
+        route_coords = coordinate_store.take(route_path)
+        route_x = route_coords[:, 0]
+        route_y = route_coords[:, 1]
+        route_z = route_coords[:, 2]
         
         # Add the route line
         fig.add_trace(go.Scatter3d(
@@ -82,7 +100,7 @@ def show_campus_3d_map(current_location: str, target_location: str):
         ))
     
     # Highlight current location
-    current_coords = get_coordinates_map()[current_location]
+    current_coords = coordinate_store.coordinates_of(current_location)
     fig.add_trace(go.Scatter3d(
         x=[current_coords[0]],
         y=[current_coords[1]],
@@ -99,7 +117,7 @@ def show_campus_3d_map(current_location: str, target_location: str):
     ))
     
     # Highlight target location
-    target_coords = get_coordinates_map()[target_location]
+    target_coords = coordinate_store.coordinates_of(target_location)
     fig.add_trace(go.Scatter3d(
         x=[target_coords[0]],
         y=[target_coords[1]],
@@ -121,28 +139,82 @@ def show_campus_3d_map(current_location: str, target_location: str):
             'text': f'3D Campus Map: From {current_location} to {target_location}',
             'x': 0.5,
             'xanchor': 'center'
-        },
-        scene=dict(
-            xaxis_title='X Coordinate',
-            yaxis_title='Y Coordinate',
-            zaxis_title='Z Coordinate',
-            camera=dict(
-                eye=dict(x=1.5, y=1.5, z=1.5)
-            )
-        ),
-        width=900,
-        height=700,
-        showlegend=True
+        }
     )
     
     # Show the plot in the browser
     fig.show()
 
 
+def show_reachable_3d_map(current_location: str, max_distance: float, campus: Campus = None):
+    """
+    Create and display a 3D visualization of the campus highlighting every location that can be
+    reached from the current location within a route distance, one color per category
+    Args:
+        current_location: The user's current location
+        max_distance: Maximum route distance
+        campus: Campus handle, defaults to the default campus
+    """
+    state = resolve_state(campus)
+    current_row = state.by_name.get(normalize_key(current_location))
+    
+    if current_row is None:
+        raise ValueError(f"Current location '{current_location}' does not exist in the campus data.")
+    
+    current_location = state.names[current_row]
+    coordinate_store = state.coordinate_store
+    fig = go.Figure(state.derived('campus_3d_base_figure'))
+    
+    # One trace per category, so the legend can toggle them
+    reachable = reachable_within(current_location, max_distance, state)
+    for category, locations in sorted(reachable.items()):
+        names = [name for name, _ in locations]
+        coords = coordinate_store.take(names)
+        fig.add_trace(go.Scatter3d(
+            x=coords[:, 0],
+            y=coords[:, 1],
+            z=coords[:, 2],
+            mode='markers',
+            marker=dict(
+                size=10,
+                opacity=0.9
+            ),
+            text=[f"{name} ({distance:.2f} units)" for name, distance in locations],
+            hoverinfo='text',
+            name=f'{category} ({len(locations)})'
+        ))
+    
+    current_coords = coordinate_store.coordinates_of(current_location)
+    fig.add_trace(go.Scatter3d(
+        x=[current_coords[0]],
+        y=[current_coords[1]],
+        z=[current_coords[2]],
+        mode='markers+text',
+        marker=dict(
+            size=15,
+            color='green',
+            symbol='circle'
+        ),
+        text=[current_location],
+        textposition="middle right",
+        name='Current Location'
+    ))
+    
+    fig.update_layout(
+        title={
+            'text': f'3D Campus Map: Reachable within {max_distance:g} units of {current_location}',
+            'x': 0.5,
+            'xanchor': 'center'
+        }
+    )
+    
+    fig.show()
+
+
 if __name__ == "__main__":
     # Example usage
     print("Example 3D Campus Map Visualization")
-    print("Available locations:", get_coordinates_map().keys())
+    print("Available locations:", get_coordinate_store().names)
     
     # Example: Show map from Ibaan Building to Sto. Tomas Building
     try:
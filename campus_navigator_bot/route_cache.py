@@ -0,0 +1,137 @@
+"""
+Bounded cache of computed routes
+
+The chat sees the same popular routes over and over, so finished routes are kept in a least
+recently used cache. Campus graphs are undirected, so a route is stored once per pair of
+locations and handed out reversed when it is requested the other way round.
+
+navigation keeps one cache per campus data version (see find_route). A new version starts with a
+copy of the previous version's cache without the routes the data change can affect (see
+copy_without), so a reload never serves a route of the old data. Invalidations bump the
+cache's generation, and a route computed before an invalidation is not stored (see put), so a
+search that was still running on the old graph cannot put its route back. Closures at runtime
+only drop the routes they can affect (see discard).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROUTE_CACHE_SIZE = 1024
+
+Route = Tuple[Optional[List[str]], float]
+
+
+class RouteCache:
+    """
+    Least recently used routes keyed by (location pair, routing profile)
+    """
+
+    def __init__(self, max_size: int = ROUTE_CACHE_SIZE):
+        """
+        Args:
+            max_size: Number of routes kept; the least recently used one is dropped beyond it
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation
+        self.generation = 0
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @staticmethod
+    def _key(start: str, end: str, profile: str) -> Tuple[Tuple[str, str, str], bool]:
+        """Canonical key of a request and whether the stored route runs the other way"""
+        if end < start:
+            return (end, start, profile), True
+        return (start, end, profile), False
+
+    def get(self, start: str, end: str, profile: str) -> Optional[Route]:
+        """
+        Look up a route
+        Returns:
+            (path, distance) as find_route returns it, or None if the route is not cached
+        """
+        key, reverse = self._key(start, end, profile)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                self.misses += 1
+                return None
+            self._routes.move_to_end(key)
+            self.hits += 1
+        path, distance = route
+        if path is None:
+            return None, distance
+        # Callers get their own list, the cached path must stay unchanged
+        return list(reversed(path) if reverse else path), distance
+
+    def put(self, start: str, end: str, profile: str, path: Optional[List[str]], distance: float,
+            generation: Optional[int] = None):
+        """
+        Store a route (path None for a pair that has no route)
+        Args:
+            generation: The cache's generation read before the graph the route was computed on;
+                the route is dropped if the cache has been invalidated since
+        """
+        key, reverse = self._key(start, end, profile)
+        if path is not None:
+            path = tuple(reversed(path) if reverse else path)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._routes[key] = (path, distance)
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.max_size:
+                self._routes.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, predicate: Callable[[str, str, str, Optional[Tuple[str, ...]], float], bool]) -> int:
+        """
+        Drop the routes for which predicate(start, end, profile, path, distance) is true
+        (start and end in the order the pair is stored in, which is also the path's direction)
+        Also bumps the generation, as routes still being searched on the old graph cannot be checked
+        Returns:
+            Number of routes dropped
+        """
+        with self._lock:
+            stale = [key for key, (path, distance) in self._routes.items() if predicate(*key, path, distance)]
+            for key in stale:
+                del self._routes[key]
+            self.generation += 1
+        return len(stale)
+
+    def copy_without(self, predicate: Callable[[str, str, str, Optional[Tuple[str, ...]], float], bool]) -> 'RouteCache':
+        """
+        New cache with the routes of this one for which predicate (see discard) is false, in the
+        same order of use; this cache is left untouched
+        """
+        cache = RouteCache(self.max_size)
+        with self._lock:
+            routes = list(self._routes.items())
+        cache._routes.update((key, route) for key, route in routes if not predicate(*key, *route))
+        return cache
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._routes),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the cached routes (location names are shared)"""
+        with self._lock:
+            return sum(200 + 8 * len(path or ()) for path, _ in self._routes.values())
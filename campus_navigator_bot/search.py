@@ -4,21 +4,46 @@ Search functionality for campus locations
 
 from typing import List, Dict, Optional
 from difflib import get_close_matches
-from campus_data import get_all_locations, get_location_by_name, get_locations_by_category
+from campus_data import (
+    Campus, CampusState, get_all_locations, get_locations_by_category, normalize_key, register_derived,
+    resolve_state
+)
 
 
-def search_locations(query: str, limit: int = 10) -> List[Dict]:
+class SearchIndex:
+    """Lower-cased names and categories of one campus data version, in row order"""
+    
+    def __init__(self, state: CampusState):
+        self.names_lower = [name.lower() for name in state.names]
+        self.categories_lower = [category.lower() for category in state.categories]
+
+
+register_derived('search_index', SearchIndex)
+
+
+def _search_result(state: CampusState, row: int) -> Dict:
+    return {
+        'name': state.names[row],
+        'category': state.categories[row],
+        'coordinates': state.coordinate_store.coords[row].tolist()
+    }
+
+
+def search_locations(query: str, limit: int = 10, campus: Campus = None) -> List[Dict]:
     """
     Search for locations based on a query string
     
     Args:
         query: Search query string
         limit: Maximum number of results to return
+        campus: Campus handle, defaults to the default campus
     
     Returns:
         List of location dictionaries matching the query
     """
-    all_locations = get_all_locations()
+    # Use one data version for the whole search, even if a reload is swapped in meanwhile
+    state = resolve_state(campus)
+    index = state.derived('search_index')
     query_lower = query.lower().strip()
     
     # Direct matches first
@@ -26,53 +51,31 @@ def search_locations(query: str, limit: int = 10) -> List[Dict]:
     partial_matches = []
     category_matches = []
     
-    for location_name in all_locations:
-        location_info = get_location_by_name(location_name)
-        if not location_info:
-            continue
-            
+    for row, name_lower in enumerate(index.names_lower):
         # Direct name match
-        if query_lower == location_name.lower():
-            direct_matches.append({
-                'name': location_name,
-                'category': location_info['category'],
-                'coordinates': location_info['coordinates']
-            })
+        if query_lower == name_lower:
+            direct_matches.append(_search_result(state, row))
         # Partial name match
-        elif query_lower in location_name.lower() or location_name.lower() in query_lower:
-            partial_matches.append({
-                'name': location_name,
-                'category': location_info['category'],
-                'coordinates': location_info['coordinates']
-            })
+        elif query_lower in name_lower or name_lower in query_lower:
+            partial_matches.append(_search_result(state, row))
         # Category match
-        elif query_lower in location_info['category'].lower():
-            category_matches.append({
-                'name': location_name,
-                'category': location_info['category'],
-                'coordinates': location_info['coordinates']
-            })
+        elif query_lower in index.categories_lower[row]:
+            category_matches.append(_search_result(state, row))
     
     # If we don't have enough results, use fuzzy matching
     if len(direct_matches) + len(partial_matches) == 0:
         fuzzy_matches = get_close_matches(
             query_lower, 
-            [name.lower() for name in all_locations], 
+            index.names_lower, 
             n=limit, 
             cutoff=0.3
         )
         
         for fuzzy_match in fuzzy_matches:
-            # Find the original case name
-            original_name = next(name for name in all_locations if name.lower() == fuzzy_match)
-            if original_name not in [m['name'] for m in direct_matches + partial_matches]:
-                location_info = get_location_by_name(original_name)
-                if location_info:
-                    partial_matches.append({
-                        'name': original_name,
-                        'category': location_info['category'],
-                        'coordinates': location_info['coordinates']
-                    })
+            # The name index is case-insensitive, so it also gives us the original case name
+            row = state.by_name.get(normalize_key(fuzzy_match))
+            if row is not None and state.names[row] not in [m['name'] for m in direct_matches + partial_matches]:
+                partial_matches.append(_search_result(state, row))
     
     # Combine results in order of relevance
     results = direct_matches + partial_matches + category_matches
@@ -81,17 +84,18 @@ def search_locations(query: str, limit: int = 10) -> List[Dict]:
     return results[:limit]
 
 
-def get_locations_by_partial_match(query: str) -> List[str]:
+def get_locations_by_partial_match(query: str, campus: Campus = None) -> List[str]:
     """
     Get location names that partially match the query
     
     Args:
         query: Search query string
+        campus: Campus handle, defaults to the default campus
     
     Returns:
         List of location names that match the query
     """
-    all_locations = get_all_locations()
+    all_locations = get_all_locations(campus)
     query_lower = query.lower().strip()
     
     matches = []
@@ -102,31 +106,28 @@ def get_locations_by_partial_match(query: str) -> List[str]:
     return matches
 
 
-def get_locations_by_category_search(category: str) -> List[Dict]:
+def get_locations_by_category_search(category: str, campus: Campus = None) -> List[Dict]:
     """
     Get locations by category
     
     Args:
         category: Category to search for
+        campus: Campus handle, defaults to the default campus
     
     Returns:
         List of location dictionaries in the category
     """
-    return get_locations_by_category(category)
+    return get_locations_by_category(category, campus)
 
 
-def get_all_categories() -> List[str]:
+def get_all_categories(campus: Campus = None) -> List[str]:
     """
     Get all unique categories in the campus data
     
+    Args:
+        campus: Campus handle, defaults to the default campus
+    
     Returns:
         List of unique category names
     """
-    from campus_data import load_campus_data
-    data = load_campus_data()
-    
-    categories = set()
-    for location_id, location_info in data['locations'].items():
-        categories.add(location_info['category'])
-    
-    return sorted(list(categories))
\ No newline at end of file
+    return sorted(set(resolve_state(campus).categories))
\ No newline at end of file
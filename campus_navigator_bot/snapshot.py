@@ -0,0 +1,214 @@
+"""
+Compiled binary snapshots of campus_data.json for fast cold starts
+
+A snapshot holds the campus data in the columnar form used by campus_data.CampusState:
+memory-mappable coordinate arrays, compact string tables and the prebuilt name and category
+indexes, so loading it costs a few array views instead of a full JSON parse.
+
+File layout (little endian):
+    8 bytes   magic b'CAMPSNAP'
+    4 bytes   header length
+    header    UTF-8 JSON with the format version, source hash, metadata and section table
+    sections  64-byte aligned arrays and string tables
+
+Usage:
+    python snapshot.py [data/campus_data.json] [--output data/campus_data.snapshot]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+MAGIC = b'CAMPSNAP'
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+_ALIGNMENT = 64
+
+
+def snapshot_path_for(json_path: str) -> str:
+    """Get the snapshot path that belongs to a campus data JSON file"""
+    return os.path.splitext(json_path)[0] + SNAPSHOT_SUFFIX
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _encode_strings(strings: List[str]) -> bytes:
+    """Encode a string table as NUL separated UTF-8"""
+    for value in strings:
+        if '\0' in value:
+            raise ValueError(f"Cannot store string containing NUL in snapshot: {value!r}")
+    return '\0'.join(strings).encode('utf-8')
+
+
+def write_snapshot(state, path: str) -> int:
+    """
+    Write a campus state to a snapshot file
+    Args:
+        state: campus_data.CampusState to serialize
+        path: Output file, replaced atomically
+    Returns:
+        Size of the written file in bytes
+    """
+    location_count = len(state.names)
+
+    # Categories are stored once in a table and referenced by code from every row
+    category_table, category_codes = [], np.empty(location_count, dtype=np.int32)
+    table_index = {}
+    for row, category in enumerate(state.categories):
+        if category not in table_index:
+            table_index[category] = len(category_table)
+            category_table.append(category)
+        category_codes[row] = table_index[category]
+
+    category_keys = list(state.by_category.keys())
+    category_rows = [state.by_category[key] for key in category_keys]
+    category_indptr = np.zeros(len(category_keys) + 1, dtype=np.int32)
+    np.cumsum([len(rows) for rows in category_rows], out=category_indptr[1:])
+
+    sections = [
+        ('coordinates', np.ascontiguousarray(state.coordinate_store.coords, dtype=np.float32)),
+        ('ids', list(state.ids)),
+        ('names', list(state.names)),
+        ('category_table', category_table),
+        ('category_codes', category_codes),
+        ('name_keys', list(state.by_name.keys())),
+        ('name_rows', np.fromiter(state.by_name.values(), dtype=np.int32, count=len(state.by_name))),
+        ('category_keys', category_keys),
+        ('category_indptr', category_indptr),
+        ('category_rows', np.array([row for rows in category_rows for row in rows], dtype=np.int32)),
+    ]
+
+    # Section offsets are relative to the (aligned) end of the header
+    section_table, payloads, offset = {}, [], 0
+    for name, value in sections:
+        offset = _align(offset)
+        if isinstance(value, np.ndarray):
+            payload = value.tobytes()
+            section_table[name] = {'offset': offset, 'dtype': value.dtype.str, 'shape': list(value.shape)}
+        else:
+            payload = _encode_strings(value)
+            section_table[name] = {'offset': offset, 'length': len(payload), 'count': len(value)}
+        payloads.append((offset, payload))
+        offset += len(payload)
+
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'version': state.version,
+        'count': location_count,
+        'meta': state.meta,
+        'extras': {str(row): extra for row, extra in state.extras.items()},
+        'sections': section_table,
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for section_offset, payload in payloads:
+            f.seek(data_start + section_offset)
+            f.write(payload)
+        size = f.tell()
+    os.replace(temp_path, path)
+    return size
+
+
+def read_snapshot(path: str) -> Dict:
+    """
+    Memory-map a snapshot file
+    Args:
+        path: Snapshot file written by write_snapshot
+    Returns:
+        Keyword arguments for campus_data.CampusState; arrays are read-only views of the file
+    Raises:
+        ValueError if the file is not a snapshot of a supported format version
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a campus data snapshot")
+    (header_length,) = struct.unpack_from('<I', buffer, len(MAGIC))
+    header_start = len(MAGIC) + 4
+    header = json.loads(buffer[header_start:header_start + header_length].decode('utf-8'))
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {header.get('format')} in {path}")
+    data_start = _align(header_start + header_length)
+    sections = header['sections']
+
+    def array(name):
+        section = sections[name]
+        shape = tuple(section['shape'])
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.empty(shape, dtype=section['dtype'])
+        return np.frombuffer(buffer, dtype=section['dtype'], count=count,
+                             offset=data_start + section['offset']).reshape(shape)
+
+    def strings(name):
+        section = sections[name]
+        if section['count'] == 0:
+            return []
+        start = data_start + section['offset']
+        return buffer[start:start + section['length']].decode('utf-8').split('\0')
+
+    category_table = strings('category_table')
+    category_indptr = array('category_indptr').tolist()
+    category_rows = array('category_rows').tolist()
+    category_index = {
+        key: category_rows[category_indptr[i]:category_indptr[i + 1]]
+        for i, key in enumerate(strings('category_keys'))
+    }
+
+    return {
+        'version': header['version'],
+        'meta': header['meta'],
+        'ids': strings('ids'),
+        'names': strings('names'),
+        'categories': [category_table[code] for code in array('category_codes').tolist()],
+        'coordinates': array('coordinates'),
+        'extras': {int(row): extra for row, extra in header['extras'].items()},
+        'name_index': dict(zip(strings('name_keys'), array('name_rows').tolist())),
+        'category_index': category_index,
+    }
+
+
+def compile_snapshot(json_path: str, output_path: str = None) -> str:
+    """
+    Compile a campus data JSON file into a snapshot
+    Args:
+        json_path: Campus data JSON file
+        output_path: Snapshot file to write, defaults to the JSON path with a .snapshot suffix
+    Returns:
+        Path of the written snapshot
+    """
+    from campus_data import CampusDataStore
+
+    output_path = output_path or snapshot_path_for(json_path)
+    state = CampusDataStore(json_path, use_snapshot=False).current()
+    write_snapshot(state, output_path)
+    return output_path
+
+
+def main():
+    from campus_data import DATA_FILE
+
+    parser = argparse.ArgumentParser(description="Compile campus_data.json into a binary snapshot")
+    parser.add_argument('json_path', nargs='?', default=DATA_FILE, help="campus data JSON file")
+    parser.add_argument('--output', '-o', help="snapshot file (default: next to the JSON file)")
+    args = parser.parse_args()
+
+    output_path = compile_snapshot(args.json_path, args.output)
+    print(f"Wrote {output_path} ({os.path.getsize(output_path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
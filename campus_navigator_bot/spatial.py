@@ -0,0 +1,333 @@
+"""
+Uniform 3D grid over location coordinates for neighbor queries
+
+Points are bucketed into cubic cells and sorted by cell, so the points of any cell are one
+contiguous slice that can be found with a binary search. Radius and nearest-neighbor queries then
+only compare points in nearby cells, which keeps graph construction close to linear in the number
+of locations instead of comparing every pair, and answers "what is near this point" without
+scanning every location.
+"""
+
+import math
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# nearest_neighbors compares the remaining points with every point once that takes fewer distance
+# computations than this many per cell offset of the neighborhood it would search next
+_BRUTE_FORCE_RATIO = 1000
+
+
+class SpatialGrid:
+    """
+    Points bucketed into a uniform grid of cubic cells
+    """
+
+    def __init__(self, coords, cell_size: float):
+        """
+        Args:
+            coords: (N, 3) array of point coordinates
+            cell_size: Side of one grid cell; radius queries are cheapest with cell_size ≈ radius
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+
+        count = len(self.coords)
+        if count:
+            cells = np.floor(self.coords / self.cell_size).astype(np.int64)
+            # Shift cells so that every neighbor of an occupied cell has a valid, unique key
+            self._origin = cells.min(axis=0) - 1
+            self._shape = cells.max(axis=0) - self._origin + 2
+        else:
+            cells = np.empty((0, 3), dtype=np.int64)
+            self._origin = np.zeros(3, dtype=np.int64)
+            self._shape = np.ones(3, dtype=np.int64)
+        self.point_cells = cells - self._origin
+        keys = self._cell_keys(self.point_cells)
+
+        # Points ordered by cell; the points of one cell form a contiguous slice of `order`
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+        self.point_keys = keys
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def _cell_keys(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * self._shape[1] + cells[:, 1]) * self._shape[2] + cells[:, 2]
+
+    def _offset_key(self, offset: Tuple[int, int, int]) -> int:
+        return int((offset[0] * self._shape[1] + offset[1]) * self._shape[2] + offset[2])
+
+    def _offsets(self, reach: int) -> Iterator[Tuple[int, int, int]]:
+        """Cell offsets up to `reach` cells away, clipped to the grid beyond which there are no points"""
+        dx, dy, dz = (range(-r, r + 1) for r in np.minimum(reach, self._shape).tolist())
+        for x in dx:
+            for y in dy:
+                for z in dz:
+                    yield x, y, z
+
+    def _candidates(self, points: np.ndarray, offset: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pair every given point with every point in the cell at a fixed offset from its own
+        Returns:
+            Tuple of (query point indices, candidate point indices)
+        """
+        keys = self.point_keys[points]
+        cells = self.point_cells[points] + offset
+        inside = np.all((cells >= 0) & (cells < self._shape), axis=1)
+        keys = np.where(inside, keys + self._offset_key(offset), -1)
+
+        low = np.searchsorted(self.sorted_keys, keys, side='left')
+        high = np.searchsorted(self.sorted_keys, keys, side='right')
+        counts = np.where(inside, high - low, 0)
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Expand each query point into one row per point of the neighboring cell
+        query = np.repeat(points, counts)
+        starts = np.repeat(low - np.cumsum(counts) + counts, counts)
+        candidates = self.order[starts + np.arange(total)]
+        return query, candidates
+
+    def _distances(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        delta = self.coords[second] - self.coords[first]
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+    def pairs_within(self, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find every pair of points at most `radius` apart
+        Returns:
+            Tuple of (first, second, distance) arrays with first < second, sorted by (first, second)
+        """
+        reach = math.ceil(radius / self.cell_size)
+        points = np.arange(len(self.coords))
+        firsts, seconds, distances = [], [], []
+        for offset in self._offsets(reach):
+            if offset < (0, 0, 0):
+                # Each pair of cells is visited from one side only
+                continue
+            query, candidates = self._candidates(points, offset)
+            if offset == (0, 0, 0):
+                # Pairs within one cell would otherwise be found twice (and with themselves)
+                keep = candidates > query
+                query, candidates = query[keep], candidates[keep]
+            distance = self._distances(query, candidates)
+            near = distance <= radius
+            first = np.minimum(query[near], candidates[near])
+            second = np.maximum(query[near], candidates[near])
+            firsts.append(first)
+            seconds.append(second)
+            distances.append(distance[near])
+        return _sorted_pairs(firsts, seconds, distances)
+
+    def neighbors_within(self, points, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the other points at most `radius` away from each of the given points
+        Args:
+            points: Indices of the query points
+            radius: Search radius
+        Returns:
+            Tuple of (point, neighbor, distance) arrays
+        """
+        points = np.asarray(points, dtype=np.int64)
+        found = []
+        for offset in self._offsets(math.ceil(radius / self.cell_size)):
+            query, candidates = self._candidates(points, offset)
+            distance = self._distances(query, candidates)
+            near = (distance <= radius) & (candidates != query)
+            found.append((query[near], candidates[near], distance[near]))
+        if not found:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        point, neighbor, distance = (np.concatenate(parts) for parts in zip(*found))
+        return point, neighbor, distance
+
+    def nearest_neighbors(self, k: int, points=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the k nearest other points of each point
+        Args:
+            k: Number of neighbors per point (fewer if there are not enough points)
+            points: Indices of the query points, defaults to all points
+        Returns:
+            Tuple of (point, neighbor, distance) arrays sorted by point, then by distance
+        """
+        points = np.arange(len(self.coords)) if points is None else np.asarray(points, dtype=np.int64)
+        k = min(k, len(self.coords) - 1)
+        results = []
+        reach = 1
+        while len(points) and k > 0:
+            offset_count = int(np.prod(np.minimum(2 * reach + 1, 2 * self._shape + 1)))
+            if len(points) * len(self.coords) <= _BRUTE_FORCE_RATIO * offset_count:
+                # Few points left (outliers far from everything): comparing them with every point is
+                # cheaper than visiting a cell neighborhood that keeps growing
+                results.append(self._nearest_brute_force(points, k))
+                break
+            # Any point outside the searched cells is more than reach * cell_size away
+            query, candidates = [], []
+            for offset in self._offsets(reach):
+                q, c = self._candidates(points, offset)
+                query.append(q)
+                candidates.append(c)
+            query = np.concatenate(query)
+            candidates = np.concatenate(candidates)
+            keep = candidates != query
+            query, candidates = query[keep], candidates[keep]
+            distance = self._distances(query, candidates)
+
+            # Sort by point, then distance, with one combined key (distances are below `scale`)
+            scale = 2 * math.sqrt(3) * (reach + 1) * self.cell_size
+            order = np.argsort(query * scale + distance, kind='stable')
+            query, candidates, distance = query[order], candidates[order], distance[order]
+            first = np.searchsorted(query, query, side='left')
+            rank = np.arange(len(query)) - first
+            top = rank < k
+
+            # A point is done once its k-th candidate is provably closer than anything unsearched
+            counts = np.bincount(query[top], minlength=len(self.coords))[points]
+            kth = np.full(len(self.coords), np.inf)
+            kth[query[rank == k - 1]] = distance[rank == k - 1]
+            exhausted = reach >= int(self._shape.max())  # every cell has been searched
+            done = (counts >= k) & (kth[points] <= reach * self.cell_size) | exhausted
+            done_mask = np.zeros(len(self.coords), dtype=bool)
+            done_mask[points[done]] = True
+            selected = top & done_mask[query]
+            results.append((query[selected], candidates[selected], distance[selected]))
+
+            points = points[~done]
+            reach *= 2
+        if not results:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        point, neighbor, distance = (np.concatenate(parts) for parts in zip(*results))
+        order = np.lexsort((neighbor, distance, point))
+        return point[order], neighbor[order], distance[order]
+
+    def _nearest_brute_force(self, points: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """k nearest other points of the given points by comparing them with every point"""
+        found = []
+        # Compare in blocks so that a |points| x N distance matrix is never needed at once
+        block = max(1, (1 << 22) // len(self.coords))
+        for start in range(0, len(points), block):
+            chunk = points[start:start + block]
+            delta = self.coords[None, :, :] - self.coords[chunk][:, None, :]
+            distances = np.sqrt(np.einsum('ijk,ijk->ij', delta, delta))
+            distances[np.arange(len(chunk)), chunk] = np.inf
+            # Stable, so ties go to the lower index like in the grid search
+            nearest = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            found.append((np.repeat(chunk, k), nearest.ravel(),
+                          np.take_along_axis(distances, nearest, axis=1).ravel()))
+        point, neighbor, distance = (np.concatenate(parts) for parts in zip(*found))
+        return point, neighbor, distance
+
+    def nearest_outside(self, members: np.ndarray) -> Tuple[int, int, float]:
+        """
+        Find the closest pair of points between a set of points and all other points
+        Args:
+            members: Boolean mask of the set
+        Returns:
+            Tuple of (member, other point, distance)
+        """
+        inside = np.flatnonzero(members)
+        outside = np.flatnonzero(~members)
+        best = (-1, -1, np.inf)
+        # Compare in blocks so that large sets do not need a |set| x N distance matrix
+        block = max(1, (1 << 22) // max(len(outside), 1))
+        outside_coords = self.coords[outside]
+        for start in range(0, len(inside), block):
+            chunk = inside[start:start + block]
+            delta = outside_coords[None, :, :] - self.coords[chunk][:, None, :]
+            distances = np.sqrt(np.einsum('ijk,ijk->ij', delta, delta))
+            flat = int(np.argmin(distances))
+            row, column = divmod(flat, distances.shape[1])
+            if distances[row, column] < best[2]:
+                best = (int(chunk[row]), int(outside[column]), float(distances[row, column]))
+        return best
+
+    def _cell_of(self, point: np.ndarray) -> np.ndarray:
+        """Grid-relative cell of an arbitrary point, which may lie outside the grid"""
+        return np.floor(point / self.cell_size).astype(np.int64) - self._origin
+
+    def _points_in_cells(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Indices of the points in the box of cells from `low` to `high`, both inclusive"""
+        low = np.maximum(low, 0)
+        high = np.minimum(high, self._shape - 1)
+        if np.any(low > high):
+            return np.empty(0, dtype=np.int64)
+        # The cells of one (x, y) column have consecutive keys, so each column is one slice
+        xs, ys = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing='ij')
+        column_keys = (xs.ravel() * self._shape[1] + ys.ravel()) * self._shape[2]
+        starts = np.searchsorted(self.sorted_keys, column_keys + low[2], side='left')
+        ends = np.searchsorted(self.sorted_keys, column_keys + high[2], side='right')
+        counts = ends - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        return self.order[positions]
+
+    def _distances_to(self, point: np.ndarray, points: np.ndarray) -> np.ndarray:
+        delta = self.coords[points] - point
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+    def within(self, point, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the points at most `radius` away from an arbitrary point
+        Returns:
+            Tuple of (point indices, distances), nearest first
+        """
+        point = np.asarray(point, dtype=np.float64).reshape(3)
+        candidates = self._points_in_cells(self._cell_of(point - radius), self._cell_of(point + radius))
+        distances = self._distances_to(point, candidates)
+        near = distances <= radius
+        candidates, distances = candidates[near], distances[near]
+        order = np.lexsort((candidates, distances))
+        return candidates[order], distances[order]
+
+    def nearest(self, point, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k points nearest to an arbitrary point
+        Args:
+            point: Query coordinates
+            k: Number of points (fewer if there are not enough)
+            mask: Optional boolean array selecting the points that may be returned
+        Returns:
+            Tuple of (point indices, distances), nearest first
+        """
+        point = np.asarray(point, dtype=np.float64).reshape(3)
+        k = min(k, len(self.coords) if mask is None else int(np.count_nonzero(mask)))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        center = self._cell_of(point)
+        reach = 1
+        while True:
+            low, high = center - reach, center + reach
+            candidates = self._points_in_cells(low, high)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            distances = self._distances_to(point, candidates)
+            # Every point outside the searched box is farther away than the box's nearest face
+            box_low = (low + self._origin) * self.cell_size
+            box_high = (high + 1 + self._origin) * self.cell_size
+            covered = min(np.min(point - box_low), np.min(box_high - point))
+            if len(candidates) >= k and np.partition(distances, k - 1)[k - 1] <= covered:
+                break
+            if np.all(low <= 0) and np.all(high >= self._shape - 1):
+                # Every cell has been searched
+                break
+            reach *= 2
+        order = np.lexsort((candidates, distances))[:k]
+        return candidates[order], distances[order]
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the grid"""
+        return sum(array.nbytes for array in (
+            self.coords, self.point_cells, self.point_keys, self.order, self.sorted_keys))
+
+
+def _sorted_pairs(firsts, seconds, distances) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    first = np.concatenate(firsts) if firsts else np.empty(0, dtype=np.int64)
+    second = np.concatenate(seconds) if seconds else np.empty(0, dtype=np.int64)
+    distance = np.concatenate(distances) if distances else np.empty(0)
+    order = np.lexsort((second, first))
+    return first[order], second[order], distance[order]
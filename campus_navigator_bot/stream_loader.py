@@ -0,0 +1,138 @@
+"""
+Incremental reader for campus data JSON files
+
+The file is read in chunks and the "locations" object is walked one entry at a time, so no
+document-sized dictionary (or copy of the file) is ever held in memory. Only the standard
+library JSON decoder is used; each location record is decoded on its own with raw_decode.
+"""
+
+import codecs
+import hashlib
+import json
+from typing import Any, Callable, Dict, Tuple
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _JSONStream:
+    """A chunked JSON text buffer that decodes one value at a time"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.sha1 = hashlib.sha1()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """Append more of the file to the buffer, dropping what was already consumed"""
+        if self.eof:
+            return False
+        parts = [self.buffer[self.pos:]]
+        size = len(parts[0])
+        while True:
+            chunk = self.f.read(self.chunk_size)
+            self.sha1.update(chunk)
+            if not chunk:
+                self.eof = True
+                parts.append(self._text_decoder.decode(b'', final=True))
+                break
+            text = self._text_decoder.decode(chunk)
+            parts.append(text)
+            size += len(text)
+            if size >= min_size:
+                break
+        self.buffer = ''.join(parts)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in campus data file, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Probably cut off at the end of the buffer; grow it geometrically and retry
+                if not self._fill(min_size=2 * (len(self.buffer) - self.pos) + self.chunk_size):
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def end_of_members(self, closing: str) -> bool:
+        """Consume the separator after an object member; True if the object is closed"""
+        found = self.peek()
+        self.pos += 1
+        if found == ',':
+            return False
+        if found == closing:
+            return True
+        raise ValueError(f"Expected ',' or {closing!r} in campus data file, found {found!r}")
+
+    def drain(self):
+        """Read (and hash) whatever is left of the file, which may only be whitespace"""
+        if self.peek():
+            raise ValueError("Unexpected data after the end of the campus data document")
+
+
+def read_campus_stream(path: str, add_location: Callable[[str, Dict], None],
+                       chunk_size: int = 1 << 16) -> Tuple[Dict, str]:
+    """
+    Walk a campus data JSON file without loading the whole document
+    Args:
+        path: Campus data JSON file
+        add_location: Called with (location_id, location_info) for every location, in file order
+        chunk_size: Number of bytes read at a time
+    Returns:
+        Tuple of (top-level fields other than "locations", SHA-1 hex digest of the file)
+    """
+    meta = {}
+    with open(path, 'rb') as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(':')
+                if key == 'locations':
+                    stream.expect('{')
+                    if stream.peek() == '}':
+                        stream.pos += 1
+                    else:
+                        while True:
+                            location_id = stream.value()
+                            stream.expect(':')
+                            add_location(location_id, stream.value())
+                            if stream.end_of_members('}'):
+                                break
+                else:
+                    meta[key] = stream.value()
+                if stream.end_of_members('}'):
+                    break
+        stream.drain()
+    return meta, stream.sha1.hexdigest()
@@ -0,0 +1,156 @@
+"""
+Visiting order of a multi-stop tour
+
+Finding the shortest order to visit a set of stops is the travelling salesman problem, so the
+order is found heuristically from a matrix of route distances between the stops: a nearest
+neighbor tour (always go to the closest stop not visited yet) is improved with local search until
+no move shortens it or the time budget runs out. Two moves are tried:
+
+    2-opt  - reverse a stretch of the tour, which removes crossings
+    Or-opt - move a stretch of one to three stops elsewhere, possibly reversed
+
+The first stop, and optionally the last one, stay where they are. navigation.plan_tour computes
+the matrix and stitches the routes between consecutive stops into one path.
+"""
+
+import time
+from typing import List, Optional
+
+import numpy as np
+
+# Seconds the local search may spend improving a tour
+TOUR_TIME_BUDGET = 0.5
+
+# Longest stretch of stops an Or-opt move relocates
+OR_OPT_MAX_SEGMENT = 3
+
+
+def plan_order(matrix: np.ndarray, start: int = 0, end: Optional[int] = None,
+               time_budget: float = TOUR_TIME_BUDGET) -> List[int]:
+    """
+    Order in which to visit every stop of a distance matrix
+
+    Args:
+        matrix: (N, N) symmetric array of route distances, inf where there is no route
+        start: Index of the stop the tour starts at
+        end: Index of the stop the tour must end at, None to end anywhere. A round trip is
+            planned by adding the start a second time as its own stop.
+        time_budget: Seconds the local search may take; it stops earlier when no move helps
+
+    Returns:
+        Indices of all stops in visiting order, beginning with start (and ending with end)
+    """
+    deadline = time.perf_counter() + time_budget
+    distances = _finite(matrix).tolist()
+    order = _nearest_neighbor(distances, start, end)
+    fixed_end = end is not None
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = _two_opt(distances, order, fixed_end, deadline)
+        improved = _or_opt(distances, order, fixed_end, deadline) or improved
+    return order
+
+
+def order_length(matrix: np.ndarray, order: List[int]) -> float:
+    """Total distance of visiting the stops in order"""
+    return float(sum(matrix[a, b] for a, b in zip(order, order[1:])))
+
+
+def _finite(matrix: np.ndarray) -> np.ndarray:
+    """
+    Replace missing routes with a penalty longer than any tour, so the local search can still
+    compare tours and prefers the ones with fewer missing legs
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    finite = np.isfinite(matrix)
+    penalty = matrix[finite].sum() + 1
+    return np.where(finite, matrix, penalty)
+
+
+def _nearest_neighbor(distances: List[List[float]], start: int, end: Optional[int]) -> List[int]:
+    """Tour that always continues to the closest stop not visited yet"""
+    unvisited = set(range(len(distances))) - {start, end}
+    order = [start]
+    while unvisited:
+        row = distances[order[-1]]
+        closest = min(unvisited, key=lambda stop: (row[stop], stop))
+        unvisited.remove(closest)
+        order.append(closest)
+    if end is not None and end != start:
+        order.append(end)
+    return order
+
+
+def _two_opt(distances: List[List[float]], order: List[int], fixed_end: bool, deadline: float) -> bool:
+    """
+    Reverse stretches of the tour in place while that shortens it
+
+    Reversing order[i:j + 1] only changes the two edges at its ends, the distances inside the
+    stretch are the same both ways.
+
+    Returns:
+        Whether the tour was improved
+    """
+    last = len(order) - 1 if fixed_end else len(order)
+    improved = False
+    changed = True
+    while changed and time.perf_counter() < deadline:
+        changed = False
+        for i in range(1, last - 1):
+            before, first = order[i - 1], order[i]
+            before_row, first_row = distances[before], distances[first]
+            for j in range(i + 1, last):
+                stop = order[j]
+                if j + 1 < len(order):
+                    after = order[j + 1]
+                    delta = (before_row[stop] + first_row[after]
+                             - before_row[first] - distances[stop][after])
+                else:
+                    delta = before_row[stop] - before_row[first]
+                if delta < -1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    first, first_row = order[i], distances[order[i]]
+                    improved = changed = True
+    return improved
+
+
+def _or_opt(distances: List[List[float]], order: List[int], fixed_end: bool, deadline: float) -> bool:
+    """
+    Move stretches of up to OR_OPT_MAX_SEGMENT stops to a better place in the tour, in place
+
+    Returns:
+        Whether the tour was improved
+    """
+    improved = False
+    changed = True
+    while changed and time.perf_counter() < deadline:
+        changed = False
+        last = len(order) - 1 if fixed_end else len(order)
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            for i in range(1, last - length + 1):
+                segment = order[i:i + length]
+                head, tail = segment[0], segment[-1]
+                before = order[i - 1]
+                after = order[i + length] if i + length < len(order) else None
+                removed_gain = distances[before][head] + (
+                    distances[tail][after] - distances[before][after] if after is not None else 0)
+                rest = order[:i] + order[i + length:]
+                best_delta, best_move = -1e-9, None
+                # Insert between rest[k] and rest[k + 1], never in front of the start or after a fixed end
+                for k in range(len(rest) - (1 if fixed_end else 0)):
+                    left = rest[k]
+                    right = rest[k + 1] if k + 1 < len(rest) else None
+                    for reverse, (near, far) in ((False, (head, tail)), (True, (tail, head))):
+                        added = distances[left][near] + (
+                            distances[far][right] - distances[left][right] if right is not None else 0)
+                        delta = added - removed_gain
+                        if delta < best_delta:
+                            best_delta, best_move = delta, (k, reverse)
+                if best_move is not None:
+                    k, reverse = best_move
+                    order[:] = rest[:k + 1] + (segment[::-1] if reverse else segment) + rest[k + 1:]
+                    improved = changed = True
+                    break
+            if changed:
+                break
+    return improved
@@ -7,24 +7,23 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 import numpy as np
-from campus_data import get_all_locations, get_location_by_name
+from campus_data import get_all_locations, get_location_by_name, load_campus_data as _load_campus_data
 from navigation import get_directions as get_navigation_directions
 
 
 def load_campus_data():
     """Load campus data from JSON file"""
-    with open('data/campus_data.json', 'r') as f:
-        return json.load(f)
+    return _load_campus_data()
 
 def find_best_match(user_input, possible_matches, threshold=0.3):
     """Find the best match for user input from possible matches using difflib"""
     matches = get_close_matches(user_input.lower(), possible_matches, n=1, cutoff=threshold)
     return matches[0] if matches else None
 
-def get_location_info(location_name, data):
+def get_location_info(location_name, data=None, campus=None):
     """Get information about a specific location"""
     # Use the campus_data module to get location info
-    location_info = get_location_by_name(location_name)
+    location_info = get_location_by_name(location_name, campus)
     if location_info:
         return {
             "name": location_info["name"],
@@ -36,15 +35,15 @@ def get_location_info(location_name, data):
     return None
 
 
-def get_timing_info(timing_query, data):
+def get_timing_info(timing_query, data=None):
     """Get timing information based on query - not implemented in new data"""
     # The new data doesn't have timing information
     return None
 
 
-def get_directions(start, end, data):
+def get_directions(start, end, data=None, campus=None):
     """Get directions between two points using the navigation module"""
-    return get_navigation_directions(start, end)
+    return get_navigation_directions(start, end, campus)
 
 class IntentClassifier:
     """Simple ML model to classify user intents using Naive Bayes"""